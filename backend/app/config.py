@@ -11,6 +11,17 @@ class Settings(BaseModel):
     CORS_EXTRA_ORIGINS: str = os.getenv("CORS_EXTRA_ORIGINS", "")
 
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./n2a.db")
+    # Connection pool, per engine (the sync and async engines each get one) and per process
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # seconds; recycle before the server / proxy drops idle connections (-1 = never)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Requests over either threshold are logged with their query count and DB time (0 = off)
+    SLOW_REQUEST_MS: int = int(os.getenv("SLOW_REQUEST_MS", "1000"))
+    SLOW_REQUEST_QUERIES: int = int(os.getenv("SLOW_REQUEST_QUERIES", "50"))
+    # Server-Timing header (query count + DB time) on every response
+    SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "true").lower() == "true"
 
     JWT_SECRET: str = os.getenv("JWT_SECRET", "change_me_dev")
     COOKIE_NAME: str = os.getenv("COOKIE_NAME", "n2a_session")
@@ -33,5 +44,60 @@ class Settings(BaseModel):
 
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # Point at a local stand-in (bench/fake_openai.py) to measure the review path offline
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+    OPENAI_HTTP2: bool = os.getenv("OPENAI_HTTP2", "true").lower() == "true"
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", "35"))
+    OPENAI_CONNECT_TIMEOUT: float = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE: int = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+    OPENAI_KEEPALIVE_EXPIRY: float = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+
+    # Client-side rate limiting / retries (keep a bit under the account's provider limits)
+    OPENAI_RPM: int = int(os.getenv("OPENAI_RPM", "500"))
+    OPENAI_TPM: int = int(os.getenv("OPENAI_TPM", "200000"))
+    OPENAI_MIN_CONCURRENCY: int = int(os.getenv("OPENAI_MIN_CONCURRENCY", "2"))
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+    OPENAI_BACKOFF_BASE: float = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+    OPENAI_BACKOFF_MAX: float = float(os.getenv("OPENAI_BACKOFF_MAX", "30"))
+
+    AI_CACHE_LRU_SIZE: int = int(os.getenv("AI_CACHE_LRU_SIZE", "2048"))
+    AI_CACHE_TTL_DAYS: int = int(os.getenv("AI_CACHE_TTL_DAYS", "30"))
+    AI_CACHE_MAX_ROWS: int = int(os.getenv("AI_CACHE_MAX_ROWS", "200000"))
+    # How often the job worker trims the cache table (TTL + AI_CACHE_MAX_ROWS)
+    AI_CACHE_PRUNE_SECONDS: float = float(os.getenv("AI_CACHE_PRUNE_SECONDS", "300"))
+
+    AI_FUSED_BOTH: bool = os.getenv("AI_FUSED_BOTH", "false").lower() == "true"
+
+    AI_PACK_SIZE: int = int(os.getenv("AI_PACK_SIZE", "10"))
+    AI_PACK_TOKEN_BUDGET: int = int(os.getenv("AI_PACK_TOKEN_BUDGET", "3000"))
+
+    AI_BATCH_CONCURRENCY: int = int(os.getenv("AI_BATCH_CONCURRENCY", "8"))
+    AI_BATCH_FLUSH_EVERY: int = int(os.getenv("AI_BATCH_FLUSH_EVERY", "50"))
+
+    # Background review jobs (python -m app.worker, or in-process with the API)
+    AI_WORKER_IN_PROCESS: bool = os.getenv("AI_WORKER_IN_PROCESS", "true").lower() == "true"
+    AI_JOB_CONCURRENCY: int = int(os.getenv("AI_JOB_CONCURRENCY", "4"))
+    AI_JOB_POLL_SECONDS: float = float(os.getenv("AI_JOB_POLL_SECONDS", "2"))
+    AI_JOB_MAX_ATTEMPTS: int = int(os.getenv("AI_JOB_MAX_ATTEMPTS", "3"))
+    AI_JOB_STALE_SECONDS: int = int(os.getenv("AI_JOB_STALE_SECONDS", "300"))
+
+    # Markdown import (POST /projects/{id}/import); IMPORT_MAX_BYTES also caps zip uploads (checked
+    # while they arrive, see upload_limit.py); IMPORT_BATCH_SIZE also chunks bulk card saves
+    IMPORT_MAX_BYTES: int = int(os.getenv("IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+    # Largest page GET /cards/{project_id}?limit= will serve
+    CARDS_PAGE_MAX: int = int(os.getenv("CARDS_PAGE_MAX", "1000"))
+    # Largest page of GET /cards/search (every hit is ranked and highlighted)
+    SEARCH_PAGE_MAX: int = int(os.getenv("SEARCH_PAGE_MAX", "100"))
+    # Near-duplicate cards: Jaccard similarity of their shingles (see services/dedupe)
+    DEDUPE_THRESHOLD: float = float(os.getenv("DEDUPE_THRESHOLD", "0.8"))
+    # Zipped Notion exports (POST /projects/import-zip); IMPORT_WORKERS=0 means one per CPU
+    IMPORT_WORKERS: int = int(os.getenv("IMPORT_WORKERS", "0"))
+    IMPORT_POOL_MIN_PAGES: int = int(os.getenv("IMPORT_POOL_MIN_PAGES", "8"))
+    IMPORT_ZIP_MAX_PAGES: int = int(os.getenv("IMPORT_ZIP_MAX_PAGES", "5000"))
+    IMPORT_ZIP_MAX_BYTES: int = int(os.getenv("IMPORT_ZIP_MAX_BYTES", str(500 * 1024 * 1024)))
 
 settings = Settings()
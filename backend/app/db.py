@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
 
@@ -23,18 +24,43 @@ def _normalize_db_url(url: str) -> str:
 
     return url
 
+def _async_db_url(url: str) -> str:
+    # psycopg 3 is sync and async in one driver; SQLite needs aiosqlite
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
 db_url = _normalize_db_url(settings.DATABASE_URL)
+async_db_url = _async_db_url(db_url)
 
 connect_args = {}
+pool_args = {}
 if db_url.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
+else:
+    pool_args = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
 
-engine = create_engine(db_url, pool_pre_ping=True, connect_args=connect_args)
+engine = create_engine(db_url, pool_pre_ping=True, connect_args=connect_args, **pool_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# For async def routes: queries and commits await the driver instead of blocking the event loop.
+# expire_on_commit=False: an expired attribute would need a lazy load, which async sessions can't do.
+# Sync helpers (services/*) run on it via `await db.run_sync(fn, *args)`.
+async_engine = create_async_engine(async_db_url, pool_pre_ping=True, connect_args=connect_args, **pool_args)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+log = logging.getLogger("n2a.db")
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_ms: float = 0.0
+
+
+# Set per request by DBTimingMiddleware. Sync routes run in the threadpool with a copy of the
+# context, which still points at the same RequestStats, so their queries are counted too.
+_stats: ContextVar[RequestStats | None] = ContextVar("n2a_db_stats", default=None)
+
+
+def instrument(engine: Engine) -> None:
+    """
+    Count queries and time spent in the driver for the current request (async engines: pass .sync_engine).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if _stats.get() is not None:
+            conn.info.setdefault("n2a_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        stats = _stats.get()
+        starts = conn.info.get("n2a_query_start")
+        if stats is None or not starts:
+            return
+        stats.queries += 1
+        stats.db_ms += (time.perf_counter() - starts.pop()) * 1000
+
+
+def _pool_status(engines: dict[str, Engine]) -> str:
+    out = []
+    for name, e in engines.items():
+        pool = e.pool
+        if hasattr(pool, "checkedout"):
+            # more checked out than the pool size means it's into overflow; near size+overflow, requests queue
+            out.append(f"{name} {pool.checkedout()} checked out of {pool.size()}")
+    return ", ".join(out) or "n/a"
+
+
+class DBTimingMiddleware:
+    """
+    Per-request query count and DB time: sent as a Server-Timing header, and logged (with pool
+    usage) when a request goes over SLOW_REQUEST_MS or SLOW_REQUEST_QUERIES.
+    Plain ASGI rather than BaseHTTPMiddleware, so streaming responses pass straight through;
+    their header only covers the queries made before the first byte, the log covers all of them.
+    """
+
+    def __init__(self, app: ASGIApp, engines: dict[str, Engine]):
+        self.app = app
+        self.engines = engines
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _stats.set(stats)
+        start = time.perf_counter()
+        status = 0
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING:
+                    total = (time.perf_counter() - start) * 1000
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing",
+                        f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries", app;dur={total:.1f}',
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _stats.reset(token)
+            total = (time.perf_counter() - start) * 1000
+            slow = settings.SLOW_REQUEST_MS and total >= settings.SLOW_REQUEST_MS
+            chatty = settings.SLOW_REQUEST_QUERIES and stats.queries >= settings.SLOW_REQUEST_QUERIES
+            if slow or chatty:
+                log.warning(
+                    "slow request %s %s -> %s: %.0f ms, %d queries, %.0f ms in db; pool: %s",
+                    scope.get("method"), scope.get("path"), status or "-",
+                    total, stats.queries, stats.db_ms, _pool_status(self.engines),
+                )
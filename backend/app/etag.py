@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+# Browsers keep the response but revalidate it every time (If-None-Match), so a
+# resume after refresh costs one tiny 304 instead of the whole card list.
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    Weak ETag over the given parts (revision, user, query params, ...).
+    """
+    raw = "|".join(str(p) for p in parts)
+    return 'W/"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def body_etag(body) -> str:
+    """
+    ETag for small responses with no revision to key on: hash of the JSON body itself.
+    """
+    return make_etag(json.dumps(body, sort_keys=True, default=str))
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison: W/"x" matches "x"
+    bare = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == bare for t in if_none_match.split(","))
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """
+    A 304 if the client's If-None-Match already has this ETag, else None.
+    """
+    inm = request.headers.get("if-none-match")
+    if inm and _matches(inm, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
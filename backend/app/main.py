@@ -1,23 +1,60 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
-from .db import engine, Base
+from .db import async_engine, engine
+from .db_timing import DBTimingMiddleware, instrument
+from .upload_limit import UploadLimitMiddleware
+from .services.openai_client import open_client, close_client
+from .services.ai_jobs import run_worker
+from .services.md_import import shutdown_pool
 
 from .routes.auth_routes import router as auth_router
 from .routes.projects_routes import router as projects_router
 from .routes.cards_routes import router as cards_router
 from .routes.export_routes import router as export_router
 from .routes.ai_routes import router as ai_router
+from .routes.ai_jobs_routes import router as ai_jobs_router
 from .routes.billing_routes import router as billing_router
 from .routes.stripe_webhook_routes import router as stripe_router
 from .routes.usage_routes import router as usage_router  # ✅ ADD
 
-Base.metadata.create_all(bind=engine)
+# The schema is managed by migrations (python -m app.migrate), not created at import.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_client()
+
+    stop = asyncio.Event()
+    worker = asyncio.create_task(run_worker(stop)) if settings.AI_WORKER_IN_PROCESS else None
+    try:
+        yield
+    finally:
+        stop.set()
+        if worker:
+            # let in-flight items finish briefly; anything cut off is re-queued as stale later
+            try:
+                await asyncio.wait_for(worker, timeout=10)
+            except asyncio.TimeoutError:
+                pass
+        await close_client()
+        shutdown_pool()
+        await async_engine.dispose()
+
+
+app = FastAPI(title="N2A API", version="2.0", lifespan=lifespan)
 
-app = FastAPI(title="N2A API", version="2.0")
+instrument(engine)
+instrument(async_engine.sync_engine)
+app.add_middleware(DBTimingMiddleware, engines={"sync": engine, "async": async_engine.sync_engine})
+# Markdown / zip imports: stop oversized uploads before they are spooled
+app.add_middleware(UploadLimitMiddleware, max_bytes=settings.IMPORT_MAX_BYTES, paths=r"/projects/(import-zip|\d+/import)")
 
 
 def _cors_origins() -> list[str]:
@@ -71,6 +108,7 @@ app.include_router(projects_router)
 app.include_router(cards_router)
 app.include_router(export_router)
 app.include_router(ai_router)
+app.include_router(ai_jobs_router)
 app.include_router(billing_router)
 app.include_router(stripe_router)
 app.include_router(usage_router)  # ✅ ADD
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+# Schema migrations (Alembic, see backend/migrations/):
+#
+#     python -m app.migrate          # upgrade to the latest revision
+#     python -m app.migrate 0002     # upgrade to a given revision
+#
+# Run it before starting the API / worker on each release; the app doesn't create tables
+# itself. Databases built by the old Base.metadata.create_all are upgraded in place.
+# Anything else (downgrade, history, new revisions) goes through the `alembic` CLI in backend/.
+
+import sys
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def alembic_config(configure_logger: bool = True) -> Config:
+    cfg = Config(str(BACKEND_DIR / "alembic.ini"))
+    # absolute, so this works from any working directory
+    cfg.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    cfg.attributes["configure_logger"] = configure_logger
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    return cfg
+
+
+def upgrade(revision: str = "head", configure_logger: bool = True) -> None:
+    """
+    Bring the database (settings.DATABASE_URL) up to `revision`.
+    configure_logger=False leaves the caller's logging setup alone.
+    """
+    command.upgrade(alembic_config(configure_logger), revision)
+
+
+if __name__ == "__main__":
+    upgrade(sys.argv[1] if len(sys.argv) > 1 else "head")
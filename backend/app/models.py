@@ -1,5 +1,5 @@
 from __future__ import annotations
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from .db import Base
 
@@ -10,10 +10,13 @@ class User(Base):
     email = Column(String(255), unique=True, index=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
 
-    stripe_customer_id = Column(String(255), nullable=True)
+    # looked up by the Stripe webhook
+    stripe_customer_id = Column(String(255), nullable=True, index=True)
     plan = Column(String(32), nullable=False, default="free")
     usage_month = Column(String(16), nullable=True)
     usage_count = Column(Integer, nullable=False, default=0)
+    # live cards across all projects (services/usage_counters keeps it up to date)
+    cards_total = Column(Integer, nullable=False, default=0, server_default="0")
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -28,15 +31,30 @@ class PasswordReset(Base):
 
 class Project(Base):
     __tablename__ = "projects"
+    # project lists filter by owner, newest first
+    __table_args__ = (Index("ix_projects_owner_id_created_at", "owner_id", "created_at"),)
     id = Column(Integer, primary_key=True)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     name = Column(String(255), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # bumped by every card write (create/update/delete/AI write-back); drives card-list ETags
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    # revision at which all cards were last replaced; older delta-sync clients must start over
+    reset_revision = Column(Integer, nullable=False, default=0, server_default="0")
+    # live cards in the project (services/usage_counters keeps it up to date)
+    card_count = Column(Integer, nullable=False, default=0, server_default="0")
 
 class Card(Base):
     __tablename__ = "cards"
+    # card listings page by (project_id, id) - see services/cards_store.list_cards_page
+    # delta sync filters on (project_id, revision) - see GET /projects/{id}/changes
+    __table_args__ = (
+        Index("ix_cards_project_id_id", "project_id", "id"),
+        Index("ix_cards_project_id_revision", "project_id", "revision"),
+    )
     id = Column(Integer, primary_key=True)
-    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    # indexed by the composite indexes above
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     card_type = Column(String(16), nullable=False)
     front = Column(Text, nullable=False)
     back = Column(Text, nullable=False)
@@ -47,5 +65,75 @@ class Card(Base):
     ai_feedback = Column(Text, nullable=True)
     ai_suggest_front = Column(Text, nullable=True)
     ai_suggest_back = Column(Text, nullable=True)
+    # review_cache.cache_key of the text/variant/mode last reviewed (lets re-reviews skip unchanged cards)
+    ai_review_hash = Column(String(64), nullable=True)
+    # parser_md.card_fingerprint of the imported text (lets re-imports keep unchanged cards)
+    source_fingerprint = Column(String(64), nullable=True)
+
+    # project revision of the last write to this card
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CardTombstone(Base):
+    __tablename__ = "card_tombstones"
+    # one row per deleted card, so delta sync can report deletions
+    __table_args__ = (Index("ix_card_tombstones_project_id_revision", "project_id", "revision"),)
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    # no FK: the card is gone
+    card_id = Column(Integer, nullable=False)
+    # project revision of the delete
+    revision = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class UsageCounter(Base):
+    __tablename__ = "usage_counters"
+    # one row per user per month ("2026-10"), written in the same transaction as the cards /
+    # AI reviews it counts - see services/usage_counters.py
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(String(7), primary_key=True)
+    # cards created that month that still exist
+    cards_created = Column(Integer, nullable=False, default=0, server_default="0")
+    ai_reviews = Column(Integer, nullable=False, default=0, server_default="0")
+
+class AIReviewCache(Base):
+    __tablename__ = "ai_review_cache"
+    # sha256 of (front, back, variant, mode, model, prompt version) - see services/review_cache.py
+    key = Column(String(64), primary_key=True)
+    result = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class AIJob(Base):
+    __tablename__ = "ai_jobs"
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    # queued | running | done | cancelled
+    status = Column(String(16), nullable=False, default="queued")
+
+    variant = Column(String(16), nullable=False, default="en-AU")
+    mode = Column(String(16), nullable=False, default="content")
+    apply = Column(Boolean, default=False, nullable=False)
+    fused = Column(Boolean, default=False, nullable=False)
+    total = Column(Integer, nullable=False, default=0)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class AIJobItem(Base):
+    __tablename__ = "ai_job_items"
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("ai_jobs.id"), nullable=False, index=True)
+    # no FK: cards can be replaced while a job is queued; the worker records that as a failure
+    card_id = Column(Integer, nullable=False)
+    # pending | running | done | failed | cancelled
+    status = Column(String(16), nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime(timezone=True), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    flag = Column(String(32), nullable=True)
+    cached = Column(Boolean, default=False, nullable=False)
+    error = Column(Text, nullable=True)
@@ -1,6 +1,9 @@
 from __future__ import annotations
+import hashlib
+import io
+import re
 from dataclasses import dataclass
-from typing import List
+from typing import Iterable, Iterator, List
 
 @dataclass
 class ParsedCard:
@@ -8,77 +11,143 @@ class ParsedCard:
     front: str
     back: str
     raw: str | None = None
+    # Lines [source_start, source_end) of the input the card came from (0-based)
+    source_start: int | None = None
+    source_end: int | None = None
+
+    @property
+    def fingerprint(self) -> str:
+        return card_fingerprint(self.card_type, self.front, self.back)
+
+
+def card_fingerprint(card_type: str, front: str, back: str) -> str:
+    """
+    Content fingerprint of a parsed card; re-imports match existing cards on it.
+    """
+    s = "".join(f"{len(p)}:{p}" for p in (card_type or "", front or "", back or ""))
+    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+
+# One match per line: leading whitespace, then an optional tag. (?ai:) keeps the case
+# folding ASCII-only (same as str.lower() for these words) while \s stays Unicode,
+# like str.strip().
+_LINE_RE = re.compile(r"\s*(?:(?ai:(?P<q>question|quesition|quesiton)|(?P<m>mcq|mcu)|(?P<a>answer)):)?")
+
+# Line classes, computed once per line (bit flags; a line can be e.g. indented and blank)
+_QUESTION = 1
+_MCQ = 2
+_BLANK = 4
+_INDENT = 8    # 4 spaces or a tab
+_BULLET = 16   # "- " or "* "
+_ANSWER = 32   # "Answer:" (only meaningful inside an MCQ)
+
+_TAGS = {"q": _QUESTION, "m": _MCQ, "a": _ANSWER}
+
+_ITEM_CHARS = " \t-*•"
+
+
+def _classify(line: str) -> int:
+    m = _LINE_RE.match(line)
+    tag = m.lastgroup
+    if tag is not None:
+        kind = _TAGS[tag]
+        if kind != _ANSWER:
+            return kind
+    elif m.end() == len(line):
+        kind = _BLANK
+    else:
+        kind = 0
+
+    if line.startswith(("    ", "\t")):
+        kind |= _INDENT
+    elif line.startswith(("- ", "* ")):
+        kind |= _BULLET
+    return kind
 
-def _norm_tag(line: str) -> str | None:
-    s = line.strip().lower()
-    if s.startswith("question:") or s.startswith("quesition:") or s.startswith("quesiton:"):
-        return "question"
-    if s.startswith("mcq:") or s.startswith("mcu:"):
-        return "mcq"
-    return None
 
 def parse_markdown(md_text: str) -> List[ParsedCard]:
-    lines = md_text.splitlines()
-    cards: List[ParsedCard] = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        tag = _norm_tag(line)
-        if not tag:
-            i += 1
-            continue
+    return list(iter_cards(md_text.splitlines()))
 
-        if tag == "question":
-            q = line.split(":", 1)[1].strip()
-            i += 1
-            ans_lines = []
-            while i < len(lines):
-                nxt = lines[i]
-                if _norm_tag(nxt):
-                    break
-                if nxt.startswith(("    ", "\t", "- ", "* ")):
-                    ans_lines.append(nxt.lstrip(" \t-*•").rstrip())
-                elif nxt.strip() == "":
-                    if ans_lines:
-                        ans_lines.append("")
-                else:
-                    if ans_lines:
-                        break
-                i += 1
-            back = "\n".join(ans_lines).strip()
-            cards.append(ParsedCard(card_type="qa", front=q, back=back))
-            continue
 
-        if tag == "mcq":
-            stem = line.split(":", 1)[1].strip()
-            i += 1
-            options = []
+def parse_page(data: bytes) -> list[tuple]:
+    """
+    Parse one raw .md file into (card_type, front, back, raw) tuples.
+    Used by the zip importer's worker processes: plain bytes in, plain tuples out
+    (cheap to pickle), and this module imports nothing heavy.
+    """
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", errors="replace", newline=None)
+    return [(c.card_type, c.front, c.back, c.raw) for c in iter_cards(lines)]
+
+
+def iter_cards(lines: Iterable[str]) -> Iterator[ParsedCard]:
+    """
+    Parse Question:/MCQ: blocks from any iterable of lines (a list, a text file,
+    an upload stream) in a single pass, yielding each card as soon as it ends.
+    Trailing newlines are ignored, so file objects can be passed straight in.
+
+    State machine over the lines; each line is classified exactly once.
+    Each card records its source span: the tag line through its last content line.
+    """
+    # Card being built: tag is _QUESTION / _MCQ, or 0 when between cards
+    tag = 0
+    head = ""                 # question text / MCQ stem
+    items: list[str] = []     # answer lines / MCQ options
+    answer = ""
+    in_answer = False
+    start = end = 0
+
+    def build() -> ParsedCard:
+        if tag == _QUESTION:
+            return ParsedCard("qa", head, "\n".join(items).strip(), None, start, end)
+        front = head + ("\n" + "\n".join(items) if items else "")
+        return ParsedCard("mcq", front, answer.strip(), None, start, end)
+
+    for i, line in enumerate(lines):
+        if line.endswith(("\n", "\r")):
+            line = line.rstrip("\r\n")
+        kind = _classify(line)
+
+        if kind & (_QUESTION | _MCQ):
+            if tag:
+                yield build()
+            tag = kind
+            head = line.split(":", 1)[1].strip()
+            items = []
             answer = ""
             in_answer = False
-            while i < len(lines):
-                nxt = lines[i]
-                if _norm_tag(nxt):
-                    break
-                if nxt.strip() == "":
-                    i += 1
-                    continue
-                if nxt.strip().lower().startswith("answer:"):
-                    in_answer = True
-                    i += 1
-                    continue
-                if in_answer:
-                    if nxt.startswith(("    ", "\t")):
-                        answer = nxt.strip()
-                        i += 1
-                        continue
-                    break
-                if nxt.startswith(("    ", "\t", "- ", "* ")):
-                    options.append(nxt.lstrip(" \t-*•").rstrip())
-                    i += 1
-                    continue
-                break
-            front = stem + ("\n" + "\n".join(options) if options else "")
-            cards.append(ParsedCard(card_type="mcq", front=front, back=answer.strip()))
+            start, end = i, i + 1
             continue
 
-    return cards
+        if tag == _QUESTION:
+            if kind & (_INDENT | _BULLET):
+                items.append(line.lstrip(_ITEM_CHARS).rstrip())
+                end = i + 1
+            elif kind & _BLANK:
+                if items:
+                    items.append("")
+            elif items:
+                # plain text after the answer ends the card
+                yield build()
+                tag = 0
+
+        elif tag == _MCQ:
+            if kind & _BLANK:
+                continue
+            if kind & _ANSWER:
+                in_answer = True
+                end = i + 1
+            elif in_answer:
+                if kind & _INDENT:
+                    answer = line.strip()
+                    end = i + 1
+                else:
+                    yield build()
+                    tag = 0
+            elif kind & (_INDENT | _BULLET):
+                items.append(line.lstrip(_ITEM_CHARS).rstrip())
+                end = i + 1
+            else:
+                yield build()
+                tag = 0
+
+    if tag:
+        yield build()
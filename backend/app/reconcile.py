@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+# Repair the denormalised usage counters (projects.card_count, users.cards_total,
+# usage_counters) from the cards themselves:
+#
+#     python -m app.reconcile            # every user
+#     python -m app.reconcile 42         # just user 42
+#
+# Safe to run any time (e.g. from a daily cron); counters that are already right are left alone.
+
+import sys
+
+from .db import SessionLocal
+from .services.usage_counters import reconcile
+
+
+def main(user_id: int | None = None) -> dict[str, int]:
+    db = SessionLocal()
+    try:
+        return reconcile(db, user_id)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    fixed = main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    print(", ".join(f"{name}: {n} fixed" for name, n in fixed.items()))
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import get_db
+from ..models import AIJob, AIJobItem, Card, Project
+from ..auth import require_user_id
+from ..services.ai_jobs import cancel_job, create_job, item_counts, resume_job
+from ..services.ai_review import resolve_fused
+from ..services.dedupe import duplicate_of
+from ..services import review_cache
+
+router = APIRouter(prefix="/ai/jobs", tags=["ai"])
+
+AIMode = Literal["content", "format", "both"]
+
+
+class SubmitJobPayload(BaseModel):
+    project_id: int
+    card_ids: list[int] | Literal["all"] = "all"
+    # stored on the job (ai_jobs.variant is VARCHAR(16))
+    variant: str = Field("en-AU", max_length=16)
+    apply: bool = False
+    mode: AIMode = "content"
+    fused: bool | None = None
+    # only queue cards whose text/variant/mode changed since their last review
+    incremental: bool = False
+    # leave out near-duplicates of other selected cards (the oldest of each group is queued)
+    skip_duplicates: bool = False
+
+
+def _ser_job(db: Session, job: AIJob) -> dict:
+    return {
+        "id": job.id,
+        "project_id": job.project_id,
+        "status": job.status,
+        "mode": job.mode,
+        "variant": job.variant,
+        "apply": job.apply,
+        "fused": job.fused,
+        "total": job.total,
+        "counts": item_counts(db, job.id),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+def _get_job(db: Session, job_id: int, uid: int) -> AIJob:
+    job = db.query(AIJob).filter(AIJob.id == job_id, AIJob.owner_id == uid).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("")
+def submit_job(payload: SubmitJobPayload, request: Request, db: Session = Depends(get_db)):
+    """
+    Queue a background review of a project's cards (or a subset).
+    Work continues if the tab closes; poll GET /ai/jobs/{id} for progress.
+    Quota is checked per card as the worker reaches it (cached results stay free).
+    """
+    uid = require_user_id(request)
+
+    proj = db.query(Project).filter(Project.id == payload.project_id, Project.owner_id == uid).first()
+    if not proj:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    fused = resolve_fused(payload.fused)
+
+    q = db.query(Card.id, Card.front, Card.back, Card.ai_review_hash, Card.ai_flag).filter(Card.project_id == proj.id)
+    if payload.card_ids != "all":
+        if not payload.card_ids:
+            raise HTTPException(status_code=400, detail="No cards selected")
+        q = q.filter(Card.id.in_(set(payload.card_ids)))
+
+    rows = q.order_by(Card.id.asc()).all()
+    dupes = duplicate_of(rows, settings.DEDUPE_THRESHOLD) if payload.skip_duplicates else {}
+
+    card_ids = []
+    for c in rows:
+        if c.id in dupes:
+            continue
+        if payload.incremental and c.ai_flag is not None:
+            if c.ai_review_hash == review_cache.cache_key(c.front, c.back, payload.variant, payload.mode, fused):
+                continue
+        card_ids.append(c.id)
+
+    job = create_job(
+        db,
+        owner_id=uid,
+        project_id=proj.id,
+        card_ids=card_ids,
+        variant=payload.variant,
+        mode=payload.mode,
+        apply=payload.apply,
+        fused=fused,
+    )
+    return {"job": _ser_job(db, job)}
+
+
+@router.get("")
+def list_jobs(request: Request, project_id: int | None = None, db: Session = Depends(get_db)):
+    uid = require_user_id(request)
+    q = db.query(AIJob).filter(AIJob.owner_id == uid)
+    if project_id is not None:
+        q = q.filter(AIJob.project_id == project_id)
+    jobs = q.order_by(AIJob.id.desc()).limit(50).all()
+    return {"jobs": [_ser_job(db, j) for j in jobs]}
+
+
+@router.get("/{job_id}")
+def get_job(job_id: int, request: Request, items: bool = False, db: Session = Depends(get_db)):
+    """
+    Job status + per-status counts. items=true also returns per-card outcomes.
+    """
+    uid = require_user_id(request)
+    job = _get_job(db, job_id, uid)
+
+    out = {"job": _ser_job(db, job)}
+    if items:
+        rows = db.query(AIJobItem).filter(AIJobItem.job_id == job.id).order_by(AIJobItem.id.asc()).all()
+        out["items"] = [
+            {
+                "card_id": it.card_id,
+                "status": it.status,
+                "attempts": it.attempts,
+                "flag": it.flag,
+                "cached": it.cached,
+                "error": it.error,
+            }
+            for it in rows
+        ]
+    return out
+
+
+@router.post("/{job_id}/cancel")
+def cancel(job_id: int, request: Request, db: Session = Depends(get_db)):
+    uid = require_user_id(request)
+    job = _get_job(db, job_id, uid)
+    if job.status in ("queued", "running"):
+        cancel_job(db, job)
+    return {"job": _ser_job(db, job)}
+
+
+@router.post("/{job_id}/resume")
+def resume(job_id: int, request: Request, db: Session = Depends(get_db)):
+    uid = require_user_id(request)
+    job = _get_job(db, job_id, uid)
+    if not resume_job(db, job):
+        raise HTTPException(status_code=409, detail="Nothing to resume")
+    return {"job": _ser_job(db, job)}
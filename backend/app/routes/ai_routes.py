@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+import json
 from typing import Literal
 
+import anyio
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..db import get_db
+from ..config import settings
+from ..db import get_async_db
 from ..models import User, Card, Project
 from ..auth import require_user_id
 from ..services.entitlements import can_use_ai, consume_ai
-from ..services.ai_review import review_card
+from ..services.ai_review import resolve_fused, review_card, review_card_stream
+from ..services import review_cache
+from ..services.ai_batch import BatchWriter, card_values_for_result, review_many, stored_result
+from ..services.cards_store import bump_revision
+from ..services.dedupe import duplicate_of
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
@@ -23,58 +32,280 @@ class ReviewPayload(BaseModel):
   variant: str = "en-AU"
   apply: bool = False
   mode: AIMode = "content"
+  # mode="both" only: single-call pipeline (None = server default AI_FUSED_BOTH)
+  fused: bool | None = None
+  # skip the model if the card was already reviewed with this exact text/variant/mode
+  incremental: bool = False
 
 
-def _is_incorrect_flag(flag: str | None) -> bool:
-  f = (flag or "").strip().lower()
-  return f == "incorrect" or f == "wrong" or "incorrect" in f
+class ReviewBatchPayload(BaseModel):
+  project_id: int
+  card_ids: list[int] | Literal["all"] = "all"
+  variant: str = "en-AU"
+  apply: bool = False
+  mode: AIMode = "content"
+  concurrency: int | None = None
+  packed: bool = False
+  fused: bool | None = None
+  incremental: bool = False
+  # leave out near-duplicates of other selected cards (the oldest of each group is reviewed)
+  skip_duplicates: bool = False
 
 
-@router.post("/review")
-async def review(payload: ReviewPayload, request: Request, db: Session = Depends(get_db)):
-  uid = require_user_id(request)
-  user = db.query(User).filter(User.id == uid).first()
+async def _load_review_target(db: AsyncSession, uid: int, payload: ReviewPayload) -> tuple[User, Card, Project]:
+  user = await db.get(User, uid)
   if not user:
     raise HTTPException(status_code=401, detail="Not authenticated")
 
-  ok, used, limit = can_use_ai(db, user)
-  if not ok:
-    raise HTTPException(status_code=402, detail=f"AI limit reached ({used}/{limit})")
-
-  card = db.query(Card).filter(Card.id == payload.card_id).first()
+  card = await db.get(Card, payload.card_id)
   if not card:
     raise HTTPException(status_code=404, detail="Card not found")
 
-  proj = db.query(Project).filter(Project.id == payload.project_id, Project.owner_id == uid).first()
+  proj = await db.scalar(select(Project).where(Project.id == payload.project_id, Project.owner_id == uid))
   if not proj or card.project_id != proj.id:
     raise HTTPException(status_code=403, detail="Forbidden")
 
-  result = await review_card(card.front, card.back, payload.variant, payload.mode)
+  return user, card, proj
+
+
+@router.post("/review")
+async def review(payload: ReviewPayload, request: Request, db: AsyncSession = Depends(get_async_db)):
+  uid = require_user_id(request)
+  user, card, proj = await _load_review_target(db, uid, payload)
+
+  # Same text reviewed the same way before -> reuse it, free of charge
+  fused = resolve_fused(payload.fused)
+  key = review_cache.cache_key(card.front, card.back, payload.variant, payload.mode, fused)
+  ok, used, limit = await db.run_sync(can_use_ai, user)
+
+  # Incremental: this exact text/variant/mode was already reviewed -> return what's stored
+  if payload.incremental and card.ai_review_hash == key:
+    stored = stored_result(card)
+    if stored is not None:
+      return {"ok": True, "result": stored, "cached": True, "skipped": True, "usage": {"used": used, "limit": limit}}
 
-  flag = result.get("flag")
-  incorrect = _is_incorrect_flag(flag)
+  result = await db.run_sync(review_cache.get, key)
+  cached = result is not None
+
+  if not cached:
+    if not ok:
+      raise HTTPException(status_code=402, detail=f"AI limit reached ({used}/{limit})")
+    # end the read transaction: no pooled connection held while the model runs
+    await db.commit()
+    result = await review_card(card.front, card.back, payload.variant, payload.mode, fused)
+    await db.run_sync(review_cache.put, key, result)
 
   # Store AI results so UI can show "reviewed" / warnings
-  card.ai_changed = bool(result.get("changed", False))
-  card.ai_flag = flag
-  card.ai_feedback = result.get("feedback")
-
-  if incorrect:
-    # Critical trust rule: do NOT store hallucinated "replacements" when incorrect.
-    card.ai_suggest_front = None
-    card.ai_suggest_back = None
-    # Also never apply.
-  else:
-    card.ai_suggest_front = result.get("front")
-    card.ai_suggest_back = result.get("back")
-
-    if payload.apply and result.get("changed"):
-      card.front = result.get("front")
-      card.back = result.get("back")
+  # (incorrect cards never get suggestions stored or applied)
+  for k, v in card_values_for_result(result, payload.apply, key).items():
+    setattr(card, k, v)
 
+  card.revision = await db.run_sync(bump_revision, proj.id)
   db.add(card)
-  db.commit()
+  if not cached:
+    # charged in the same commit as the card and cache writes: stored means paid for
+    await db.run_sync(consume_ai, user, 1, False)
+  await db.commit()
+
+  return {"ok": True, "result": result, "cached": cached, "skipped": False, "usage": {"used": user.usage_count, "limit": limit}}
+
+
+@router.post("/review-batch")
+async def review_batch(payload: ReviewBatchPayload, request: Request, db: AsyncSession = Depends(get_async_db)):
+  """
+  Review many cards of one project in a single request.
+  Auth, project ownership and quota are checked once; cards are reviewed server-side
+  with bounded concurrency and results are streamed back as NDJSON as each card finishes:
+
+    {"type": "start", "total": N, "queued": Q}
+    {"type": "result", "card_id": 1, "ok": true, "result": {...}}
+    {"type": "result", "card_id": 2, "ok": false, "error": "..."}
+    {"type": "done", "reviewed": R, "failed": F, "usage": {"used": U, "limit": L}}
+
+  With packed=true several cards share each model request (see ai_review.review_cards_packed).
+  With incremental=true, cards already reviewed with the same text/variant/mode are skipped
+  and their stored result is returned. With skip_duplicates=true, near-duplicates of other
+  selected cards are left out altogether (listed in the start line as duplicate_of).
+  Results already in the review cache are returned straight away and don't count against
+  quota; uncached cards beyond the remaining monthly quota are reported as errors and not
+  sent to the model.
+  """
+  uid = require_user_id(request)
+  user = await db.get(User, uid)
+  if not user:
+    raise HTTPException(status_code=401, detail="Not authenticated")
+
+  proj = await db.scalar(select(Project).where(Project.id == payload.project_id, Project.owner_id == uid))
+  if not proj:
+    raise HTTPException(status_code=404, detail="Project not found")
+
+  cols = [Card.id, Card.front, Card.back]
+  if payload.incremental:
+    cols += [
+      Card.ai_review_hash, Card.ai_changed, Card.ai_flag, Card.ai_feedback, Card.ai_suggest_front, Card.ai_suggest_back,
+    ]
+  q = select(*cols).where(Card.project_id == proj.id)
+  if payload.card_ids != "all":
+    if not payload.card_ids:
+      raise HTTPException(status_code=400, detail="No cards selected")
+    q = q.where(Card.id.in_(set(payload.card_ids)))
+  all_rows = (await db.execute(q.order_by(Card.id.asc()))).all()
+
+  dupes: dict[int, int] = {}
+  if payload.skip_duplicates:
+    # CPU-bound on big projects: keep it off the event loop
+    dupes = await anyio.to_thread.run_sync(duplicate_of, all_rows, settings.DEDUPE_THRESHOLD)
+    all_rows = [c for c in all_rows if c.id not in dupes]
+
+  fused = resolve_fused(payload.fused)
+  keys = {c.id: review_cache.cache_key(c.front, c.back, payload.variant, payload.mode, fused) for c in all_rows}
+
+  # incremental: unchanged since the last review -> return what's stored, no write, no charge
+  skipped = []
+  rows = []
+  for c in all_rows:
+    stored = stored_result(c) if payload.incremental and c.ai_review_hash == keys[c.id] else None
+    if stored is not None:
+      skipped.append((c.id, stored))
+    else:
+      rows.append((c.id, c.front, c.back))
+
+  hits = await db.run_sync(review_cache.get_many, [keys[cid] for cid, _, _ in rows])
+  cached = [(cid, hits[keys[cid]]) for cid, _, _ in rows if keys[cid] in hits]
+  misses = [r for r in rows if keys[r[0]] not in hits]
+
+  ok, used, limit = await db.run_sync(can_use_ai, user)
+  # done reading: don't hold a pooled connection for the length of the stream
+  # (results are written by BatchWriter in sessions of its own)
+  await db.commit()
+  if misses and not cached and not skipped and not ok:
+    raise HTTPException(status_code=402, detail=f"AI limit reached ({used}/{limit})")
+
+  remaining = max(limit - used, 0)
+  queued, over_quota = misses[:remaining], misses[remaining:]
+
+  concurrency = min(payload.concurrency or settings.AI_BATCH_CONCURRENCY, settings.AI_BATCH_CONCURRENCY)
+  writer = BatchWriter(uid, payload.apply, settings.AI_BATCH_FLUSH_EVERY)
+
+  def line(obj: dict) -> str:
+    return json.dumps(obj) + "\n"
+
+  async def stream():
+    reviewed = 0
+    failed = len(over_quota)
+    yield line({
+      "type": "start",
+      "total": len(all_rows),
+      "queued": len(queued),
+      "cached": len(cached),
+      "skipped": len(skipped),
+      "duplicates": len(dupes),
+      "duplicate_of": {str(k): v for k, v in dupes.items()},
+    })
+
+    for card_id, result in skipped:
+      yield line({"type": "result", "card_id": card_id, "ok": True, "cached": True, "skipped": True, "result": result})
+
+    for card_id, result in cached:
+      await writer.add(card_id, result, cache_key=keys[card_id], cached=True)
+      yield line({"type": "result", "card_id": card_id, "ok": True, "cached": True, "result": result})
+
+    for card_id, _, _ in over_quota:
+      yield line({"type": "result", "card_id": card_id, "ok": False, "error": f"AI limit reached ({limit})"})
+
+    try:
+      async for card_id, result, error in review_many(
+        queued, payload.variant, payload.mode, concurrency, payload.packed, fused
+      ):
+        if result is None:
+          failed += 1
+          yield line({"type": "result", "card_id": card_id, "ok": False, "error": error})
+          continue
+
+        reviewed += 1
+        await writer.add(card_id, result, cache_key=keys[card_id])
+        yield line({"type": "result", "card_id": card_id, "ok": True, "cached": False, "result": result})
+    finally:
+      # Persist whatever finished, even if the client disconnected mid-stream
+      # (shielded: a disconnect cancels the response task)
+      with anyio.CancelScope(shield=True):
+        await writer.flush()
+
+    usage_used = writer.used if writer.used is not None else used
+    yield line({
+      "type": "done",
+      "reviewed": reviewed,
+      "cached": len(cached),
+      "skipped": len(skipped),
+      "failed": failed,
+      "usage": {"used": usage_used, "limit": limit},
+    })
+
+  return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.post("/review-stream")
+async def review_stream(payload: ReviewPayload, request: Request, db: AsyncSession = Depends(get_async_db)):
+  """
+  /review as server-sent events, so the UI can show the model's output as it arrives:
+
+    event: pass    data: {"pass": "content", "status": "start"}
+    event: delta   data: {"pass": "content", "text": "..."}
+    event: pass    data: {"pass": "content", "status": "done"}
+    ... (mode="both" runs a "content" then a "format" pass, or one "both" pass when fused)
+    event: result  data: {"ok": true, "result": {...}, "cached": false, "skipped": false, "usage": {...}}
+    event: error   data: {"ok": false, "error": "..."}
+
+  Cached and incremental hits skip straight to the result event. The result is validated
+  and written back exactly as in /review.
+  """
+  uid = require_user_id(request)
+  user, card, _ = await _load_review_target(db, uid, payload)
+
+  fused = resolve_fused(payload.fused)
+  key = review_cache.cache_key(card.front, card.back, payload.variant, payload.mode, fused)
+  ok, used, limit = await db.run_sync(can_use_ai, user)
+
+  stored = stored_result(card) if payload.incremental and card.ai_review_hash == key else None
+  hit = await db.run_sync(review_cache.get, key) if stored is None else None
+  # done reading (see review_batch)
+  await db.commit()
+  if stored is None and hit is None and not ok:
+    raise HTTPException(status_code=402, detail=f"AI limit reached ({used}/{limit})")
+
+  card_id, front, back = card.id, card.front, card.back
+  writer = BatchWriter(uid, payload.apply, 1)
+
+  def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+  async def stream():
+    if stored is not None:
+      yield sse("result", {"ok": True, "result": stored, "cached": True, "skipped": True, "usage": {"used": used, "limit": limit}})
+      return
+
+    if hit is not None:
+      await writer.add(card_id, hit, cache_key=key, cached=True)
+      await writer.flush()
+      yield sse("result", {"ok": True, "result": hit, "cached": True, "skipped": False, "usage": {"used": used, "limit": limit}})
+      return
+
+    try:
+      async for event, data in review_card_stream(front, back, payload.variant, payload.mode, fused):
+        if event != "result":
+          yield sse(event, data)
+          continue
 
-  consume_ai(db, user, 1)
+        # flushes straight away (flush_every=1): card, cache and usage in one commit
+        await writer.add(card_id, data, cache_key=key)
+        usage_used = writer.used if writer.used is not None else used
+        yield sse("result", {"ok": True, "result": data, "cached": False, "skipped": False, "usage": {"used": usage_used, "limit": limit}})
+    except Exception as e:
+      yield sse("error", {"ok": False, "error": str(e) or e.__class__.__name__})
 
-  return {"ok": True, "result": result, "usage": {"used": user.usage_count, "limit": limit}}
+  return StreamingResponse(
+    stream(),
+    media_type="text/event-stream",
+    # proxies (nginx, Railway) must not buffer the stream
+    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+  )
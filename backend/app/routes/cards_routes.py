@@ -1,12 +1,30 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel
+from sqlalchemy import and_, func, or_, select, update
 from sqlalchemy.orm import Session
 
+from ..config import settings
 from ..db import get_db
 from ..models import Card, Project
 from ..auth import require_user_id
+from ..etag import make_etag, not_modified, set_etag
+from ..services.card_search import search_cards
+from ..services.dedupe import find_clusters
+from ..services.cards_store import (
+    CLEARED_AI,
+    RETURNED,
+    bump_revision,
+    bump_revisions_for_cards,
+    card_row,
+    delete_cards,
+    insert_returning,
+    list_cards_page,
+    parse_fields,
+    reset_cards,
+)
+from ..services.md_import import sync_cards
 
 router = APIRouter(prefix="/cards", tags=["cards"])
 
@@ -21,6 +39,10 @@ class CardIn(BaseModel):
 class CreateCardsPayload(BaseModel):
     project_id: int
     cards: list[CardIn]
+    # False: append to the project's cards instead of replacing them
+    replace: bool = True
+    # re-import: keep unchanged cards (ids + AI results) and only write what changed
+    sync: bool = False
 
 
 class UpdateCardPayload(BaseModel):
@@ -28,40 +50,166 @@ class UpdateCardPayload(BaseModel):
     back: str
 
 
+class BulkCardEdit(BaseModel):
+    id: int
+    front: str
+    back: str
+
+
+class BulkUpdatePayload(BaseModel):
+    # manual edits, same rules as PATCH /cards/{card_id}
+    cards: list[BulkCardEdit] = []
+    # cards whose stored AI suggestions should become their front/back
+    ids: list[int] = []
+    promote_suggestions: bool = False
+
+
+class BulkDeletePayload(BaseModel):
+    ids: list[int]
+
+
+def _owned_cards(db: Session, uid: int, card_ids: list[int]) -> dict[int, int]:
+    """
+    card id -> project id for the existing cards among card_ids, checked with one join per chunk.
+    403 if any of them belongs to someone else's project.
+    """
+    owned: dict[int, int] = {}
+    ids = list(dict.fromkeys(card_ids))
+    batch_size = max(1, settings.IMPORT_BATCH_SIZE)
+    for i in range(0, len(ids), batch_size):
+        rows = db.execute(
+            select(Card.id, Card.project_id, Project.owner_id)
+            .join(Project, Project.id == Card.project_id)
+            .where(Card.id.in_(ids[i:i + batch_size]))
+        ).all()
+        for r in rows:
+            if r.owner_id != uid:
+                raise HTTPException(status_code=403, detail="Forbidden")
+            owned[r.id] = r.project_id
+    return owned
+
+
+@router.get("/search")
+def search(
+    request: Request,
+    q: str = Query(min_length=1, max_length=500),
+    project_id: int | None = None,
+    limit: int = Query(default=20, ge=1),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """
+    Full-text search across all of the current user's projects (or just project_id).
+    Hits come best first with front highlighted and back as a snippet: HTML-escaped text with
+    the matching words in <mark>...</mark>. Pagination: limit (max SEARCH_PAGE_MAX) and then
+    offset=<next_offset> from the previous page; next_offset is null on the last page.
+    See services/card_search for the matching rules.
+    """
+    uid = require_user_id(request)
+
+    limit = min(limit, settings.SEARCH_PAGE_MAX)
+    hits, next_offset = search_cards(db, uid, q, project_id, limit, offset)
+    return {"q": q, "cards": hits, "next_offset": next_offset}
+
+
+@router.get("/duplicates")
+def find_duplicates(
+    request: Request,
+    project_id: int | None = None,
+    threshold: float | None = Query(default=None, ge=0.5, le=1.0),
+    db: Session = Depends(get_db),
+):
+    """
+    Groups of near-duplicate cards in one project, or across all of the current user's projects.
+    Similarity is the Jaccard similarity of the cards' normalised text (default DEDUPE_THRESHOLD);
+    the first card of each group is the oldest, the one skip_duplicates keeps.
+    See services/dedupe for how pairs are found without comparing every card with every other.
+    """
+    uid = require_user_id(request)
+
+    q = (
+        select(Card.id, Card.project_id, Card.front, Card.back)
+        .join(Project, Project.id == Card.project_id)
+        .where(Project.owner_id == uid)
+    )
+    if project_id is not None:
+        q = q.where(Card.project_id == project_id)
+    rows = db.execute(q).all()
+
+    threshold = settings.DEDUPE_THRESHOLD if threshold is None else threshold
+    by_id = {r.id: r for r in rows}
+    clusters = [
+        {
+            "keep": cluster[0][0],
+            "cards": [
+                {
+                    "id": card_id,
+                    "project_id": by_id[card_id].project_id,
+                    "front": by_id[card_id].front,
+                    "back": by_id[card_id].back,
+                    "similarity": similarity,
+                }
+                for card_id, similarity in cluster
+            ],
+        }
+        for cluster in find_clusters(rows, threshold)
+    ]
+    return {
+        "threshold": threshold,
+        "clusters": clusters,
+        "duplicates": sum(len(c["cards"]) - 1 for c in clusters),
+    }
+
+
 @router.get("/{project_id}")
-def list_cards(project_id: int, request: Request, db: Session = Depends(get_db)):
+def list_cards(
+    project_id: int,
+    request: Request,
+    response: Response,
+    limit: int | None = Query(default=None, ge=1),
+    after: int | None = None,
+    fields: str | None = None,
+    db: Session = Depends(get_db),
+):
+    """
+    A project's cards in id order.
+    Pagination: pass limit (max CARDS_PAGE_MAX) and then after=<next_cursor> from the previous
+    page; next_cursor is null on the last page. Without limit every card is returned.
+    fields=front,back,ai_flag returns (and loads) only those columns, plus id.
+    Sends an ETag keyed on the project revision; a matching If-None-Match gets a 304
+    without the cards being read at all.
+    """
     uid = require_user_id(request)
 
     proj = db.query(Project).filter(Project.id == project_id, Project.owner_id == uid).first()
     if not proj:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    cards = db.query(Card).filter(Card.project_id == project_id).order_by(Card.id.asc()).all()
+    try:
+        cols = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {
-        "cards": [
-            {
-                "id": c.id,
-                "project_id": c.project_id,
-                "card_type": c.card_type,
-                "front": c.front,
-                "back": c.back,
-                "raw": c.raw,
-                "ai_changed": c.ai_changed,
-                "ai_flag": c.ai_flag,
-                "ai_feedback": c.ai_feedback,
-                "ai_suggest_front": c.ai_suggest_front,
-                "ai_suggest_back": c.ai_suggest_back,
-            }
-            for c in cards
-        ]
-    }
+    if limit is not None:
+        limit = min(limit, settings.CARDS_PAGE_MAX)
+
+    etag = make_etag("cards", proj.id, proj.revision, limit, after, ",".join(cols))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    set_etag(response, etag)
+
+    cards, next_cursor = list_cards_page(db, project_id, cols, limit, after)
+    return {"cards": cards, "next_cursor": next_cursor}
 
 
 @router.post("")
 def create_cards(payload: CreateCardsPayload, request: Request, db: Session = Depends(get_db)):
     """
-    Option A: Replace all cards for this project with the provided list.
+    Option A: Replace all cards for this project with the provided list (replace=false appends).
+    Runs as one DELETE plus chunked multi-row INSERT ... RETURNING, in a single transaction.
+    sync=true: diff against the existing cards instead (see services/md_import.sync_cards);
+    unchanged cards keep their ids and AI results.
     IMPORTANT: Returns created cards with IDs so the frontend can call /ai/review.
     """
     uid = require_user_id(request)
@@ -70,32 +218,34 @@ def create_cards(payload: CreateCardsPayload, request: Request, db: Session = De
     if not proj:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # Replace existing cards
-    db.query(Card).filter(Card.project_id == payload.project_id).delete()
-
-    created: list[Card] = []
-    for x in payload.cards:
-        ct = (x.card_type or "qa").lower().strip()
-        if ct not in ("qa", "mcq"):
-            ct = "qa"
-
-        c = Card(
-            project_id=payload.project_id,
-            card_type=ct,
-            front=x.front or "",
-            back=x.back or "",
-            raw=x.raw,
-        )
-        db.add(c)
-        created.append(c)
+    def norm_type(ct: str | None) -> str:
+        ct = (ct or "qa").lower().strip()
+        return ct if ct in ("qa", "mcq") else "qa"
 
-    db.commit()
+    cards = [(norm_type(x.card_type), x.front or "", x.back or "", x.raw) for x in payload.cards]
 
-    # refresh for IDs
-    for c in created:
-        db.refresh(c)
+    rev = bump_revision(db, payload.project_id)
 
-    return {
+    if payload.sync:
+        counts = sync_cards(db, payload.project_id, cards, rev)
+        db.commit()
+        created = db.execute(
+            select(*RETURNED).where(Card.project_id == payload.project_id).order_by(Card.id.asc())
+        ).all()
+    else:
+        counts = None
+
+        # Replace existing cards (same transaction as the insert)
+        if payload.replace:
+            reset_cards(db, payload.project_id, rev)
+
+        rows = [card_row(payload.project_id, c, rev) for c in cards]
+
+        # ids come back from INSERT ... RETURNING, no refresh per card
+        created = insert_returning(db, rows)
+        db.commit()
+
+    out = {
         "cards": [
             {
                 "id": c.id,
@@ -108,6 +258,88 @@ def create_cards(payload: CreateCardsPayload, request: Request, db: Session = De
             for c in created
         ]
     }
+    if counts is not None:
+        out["sync"] = counts
+    return out
+
+
+@router.patch("/bulk")
+def update_cards_bulk(payload: BulkUpdatePayload, request: Request, db: Session = Depends(get_db)):
+    """
+    Many card edits in one request and one transaction, instead of a PATCH per card.
+    cards: [{id, front, back}] manual edits (AI fields cleared, like PATCH /cards/{card_id}).
+    ids + promote_suggestions=true: copy each card's ai_suggest_front/back into front/back,
+    server-side ("apply all AI suggestions"). Cards without a suggestion, or flagged
+    incorrect, are left alone, so they are not in the returned ids.
+    Returns the ids actually updated.
+    """
+    uid = require_user_id(request)
+
+    edit_ids = [c.id for c in payload.cards]
+    promote_ids = payload.ids if payload.promote_suggestions else []
+
+    owned = _owned_cards(db, uid, edit_ids + promote_ids)
+    missing = [i for i in edit_ids + promote_ids if i not in owned]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Cards not found: {', '.join(map(str, sorted(set(missing))))}")
+
+    updated: list[int] = []
+
+    # later edits of the same card win, as they would with sequential PATCHes
+    edits = {c.id: c for c in payload.cards}
+    if edits:
+        db.execute(
+            update(Card),
+            [{"id": c.id, "front": c.front, "back": c.back, **CLEARED_AI} for c in edits.values()],
+        )
+        updated.extend(edits)
+
+    # same trust rule as card_values_for_result: nothing flagged incorrect is ever applied
+    flag = func.lower(func.trim(Card.ai_flag))
+    not_incorrect = or_(Card.ai_flag.is_(None), and_(flag != "wrong", ~flag.contains("incorrect")))
+    ids = list(dict.fromkeys(promote_ids))
+    batch_size = max(1, settings.IMPORT_BATCH_SIZE)
+    for i in range(0, len(ids), batch_size):
+        updated.extend(
+            db.execute(
+                update(Card)
+                .where(
+                    Card.id.in_(ids[i:i + batch_size]),
+                    Card.ai_suggest_front.is_not(None),
+                    Card.ai_suggest_back.is_not(None),
+                    not_incorrect,
+                )
+                .values(front=Card.ai_suggest_front, back=Card.ai_suggest_back)
+                .returning(Card.id)
+                .execution_options(synchronize_session=False)
+            ).scalars()
+        )
+
+    updated = list(dict.fromkeys(updated))
+    bump_revisions_for_cards(db, updated)
+    db.commit()
+
+    return {"ok": True, "updated": updated}
+
+
+@router.delete("/bulk")
+def delete_cards_bulk(payload: BulkDeletePayload, request: Request, db: Session = Depends(get_db)):
+    """
+    Delete many cards in one request and one transaction ("delete all flagged cards").
+    Ids that don't exist are ignored, like DELETE /cards/{card_id}. Returns the ids deleted.
+    """
+    uid = require_user_id(request)
+
+    owned = _owned_cards(db, uid, payload.ids)
+
+    by_project: dict[int, list[int]] = {}
+    for card_id, project_id in owned.items():
+        by_project.setdefault(project_id, []).append(card_id)
+    for project_id, card_ids in by_project.items():
+        delete_cards(db, project_id, bump_revision(db, project_id), card_ids)
+    db.commit()
+
+    return {"ok": True, "deleted": list(owned)}
 
 
 @router.patch("/{card_id}")
@@ -126,11 +358,9 @@ def update_card(card_id: int, payload: UpdateCardPayload, request: Request, db:
     card.back = payload.back
 
     # Clear AI fields on manual edit (prevents stale suggestion badges)
-    card.ai_changed = False
-    card.ai_flag = None
-    card.ai_feedback = None
-    card.ai_suggest_front = None
-    card.ai_suggest_back = None
+    for k, v in CLEARED_AI.items():
+        setattr(card, k, v)
+    card.revision = bump_revision(db, proj.id)
 
     db.add(card)
     db.commit()
@@ -159,6 +389,6 @@ def delete_card(card_id: int, request: Request, db: Session = Depends(get_db)):
     if not proj:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    db.delete(card)
+    delete_cards(db, proj.id, bump_revision(db, proj.id), [card.id])
     db.commit()
     return {"ok": True}
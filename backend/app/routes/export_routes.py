@@ -10,10 +10,12 @@ from fastapi.responses import StreamingResponse
 from fastapi.background import BackgroundTasks
 from sqlalchemy.orm import Session
 
+from ..config import settings
 from ..db import get_db
 from ..models import Card, Project, User
 from ..auth import require_user_id
 from ..services.apkg_export import build_apkg
+from ..services.dedupe import duplicate_of
 
 router = APIRouter(prefix="/export", tags=["export"])
 
@@ -33,14 +35,23 @@ def _field_to_html(field: str) -> str:
     return s
 
 
+def _project_cards(db: Session, project_id: int, skip_duplicates: bool) -> list[Card]:
+    cards = db.query(Card).filter(Card.project_id == project_id).order_by(Card.id.asc()).all()
+    if skip_duplicates:
+        # keep the oldest card of each near-duplicate group (see services/dedupe)
+        dupes = duplicate_of(cards, settings.DEDUPE_THRESHOLD)
+        cards = [c for c in cards if c.id not in dupes]
+    return cards
+
+
 @router.get("/csv/{project_id}")
-def export_csv(project_id: int, request: Request, db: Session = Depends(get_db)):
+def export_csv(project_id: int, request: Request, skip_duplicates: bool = False, db: Session = Depends(get_db)):
     uid = require_user_id(request)
     proj = db.query(Project).filter(Project.id == project_id, Project.owner_id == uid).first()
     if not proj:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    cards = db.query(Card).filter(Card.project_id == project_id).order_by(Card.id.asc()).all()
+    cards = _project_cards(db, project_id, skip_duplicates)
     buf = io.StringIO()
     w = csv.writer(buf)
     w.writerow(["Front", "Back"])
@@ -55,17 +66,18 @@ def export_csv(project_id: int, request: Request, db: Session = Depends(get_db))
 
 
 @router.get("/tsv/{project_id}")
-def export_tsv(project_id: int, request: Request, db: Session = Depends(get_db)):
+def export_tsv(project_id: int, request: Request, skip_duplicates: bool = False, db: Session = Depends(get_db)):
     """
     TSV intended for Anki import with HTML enabled.
     No header row (prevents importing an extra card).
+    skip_duplicates=true leaves out near-duplicate cards, keeping the oldest of each group.
     """
     uid = require_user_id(request)
     proj = db.query(Project).filter(Project.id == project_id, Project.owner_id == uid).first()
     if not proj:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    cards = db.query(Card).filter(Card.project_id == project_id).order_by(Card.id.asc()).all()
+    cards = _project_cards(db, project_id, skip_duplicates)
 
     lines = []
     for c in cards:
@@ -86,10 +98,12 @@ def export_apkg(
     project_id: int,
     request: Request,
     background: BackgroundTasks,
+    skip_duplicates: bool = False,
     db: Session = Depends(get_db),
 ):
     """
     Paid-only APKG export (Anki deck package).
+    skip_duplicates=true leaves out near-duplicate cards, keeping the oldest of each group.
     """
     uid = require_user_id(request)
 
@@ -105,7 +119,7 @@ def export_apkg(
     if not proj:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    cards = db.query(Card).filter(Card.project_id == project_id).order_by(Card.id.asc()).all()
+    cards = _project_cards(db, project_id, skip_duplicates)
     if not cards:
         raise HTTPException(status_code=400, detail="No cards to export")
 
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Request
+import io
+from typing import Literal
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
 from pydantic import BaseModel
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from ..config import settings
 from ..db import get_db
-from ..models import Project, Card
+from ..models import Project
 from ..auth import require_user_id
+from ..etag import body_etag, make_etag, not_modified, set_etag
+from ..parser_md import iter_cards
+from ..services.cards_store import bump_revision, deleted_since, list_cards_page, parse_fields, reset_cards
+from ..services.md_import import ZipImportError, export_title, insert_cards, parse_zip, sync_cards
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -33,12 +42,83 @@ def create_project(payload: CreateProject, request: Request, db: Session = Depen
             "id": p.id,
             "name": p.name,
             "created_at": p.created_at.isoformat() if getattr(p, "created_at", None) else None,
+            "revision": p.revision,
+            "card_count": p.card_count,
         }
     }
 
 
+@router.post("/import-zip")
+def import_zip(
+    request: Request,
+    file: UploadFile = File(...),
+    split: Literal["merge", "pages"] = "merge",
+    project_id: int | None = None,
+    sync: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Import a zipped multi-page Notion export (multipart field "file").
+    Pages are streamed out of the zip (never extracted to disk) and parsed in a process pool;
+    see services/md_import.parse_zip. Page order is deterministic: natural sort by path,
+    ignoring Notion's page ids.
+
+    split=merge (default): all pages into one project, in page order. With project_id the
+    project's cards are replaced (or, with sync=true, diffed like POST /{id}/import?sync=true);
+    without it a new project named after the zip is created.
+    split=pages: one new project per page (named after the page); pages with no cards are skipped.
+    """
+    uid = require_user_id(request)
+
+    target = None
+    if split == "merge" and project_id is not None:
+        target = db.query(Project).filter(Project.id == project_id, Project.owner_id == uid).first()
+        if not target:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+    if file.size is not None and file.size > settings.IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    created: list[dict] = []
+    try:
+        pages = parse_zip(file.file)
+
+        if split == "merge":
+            all_cards = (c for _, cards in pages for c in cards)
+            if target is None:
+                target = Project(owner_id=uid, name=export_title(file.filename or ""))
+                db.add(target)
+                db.flush()
+                out = {"imported": insert_cards(db, target.id, all_cards, bump_revision(db, target.id))}
+            elif sync:
+                counts = sync_cards(db, target.id, all_cards, bump_revision(db, target.id))
+                out = {"imported": counts["inserted"], "sync": counts}
+            else:
+                rev = bump_revision(db, target.id)
+                reset_cards(db, target.id, rev)
+                out = {"imported": insert_cards(db, target.id, all_cards, rev)}
+            created.append({"id": target.id, "name": target.name, **out})
+        else:
+            for title, cards in pages:
+                if not cards:
+                    continue
+                p = Project(owner_id=uid, name=title)
+                db.add(p)
+                db.flush()
+                imported = insert_cards(db, p.id, cards, bump_revision(db, p.id))
+                created.append({"id": p.id, "name": p.name, "imported": imported})
+    except ZipImportError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # one commit: a bad page or zip leaves nothing half-imported
+    db.commit()
+
+    return {"ok": True, "projects": created, "imported": sum(p["imported"] for p in created)}
+
+
 @router.get("")
-def list_projects(request: Request, db: Session = Depends(get_db)):
+def list_projects(request: Request, response: Response, db: Session = Depends(get_db)):
     uid = require_user_id(request)
     q = db.query(Project).filter(Project.owner_id == uid)
 
@@ -50,20 +130,30 @@ def list_projects(request: Request, db: Session = Depends(get_db)):
 
     projects = q.all()
 
-    return {
+    out = {
         "projects": [
             {
                 "id": p.id,
                 "name": p.name,
                 "created_at": p.created_at.isoformat() if getattr(p, "created_at", None) else None,
+                "revision": p.revision,
+                "card_count": p.card_count,
             }
             for p in projects
         ]
     }
 
+    # small body, no single revision to key on: hash the body itself
+    etag = body_etag(out)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    set_etag(response, etag)
+    return out
+
 
 @router.get("/latest")
-def get_latest_project(request: Request, db: Session = Depends(get_db)):
+def get_latest_project(request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Returns the most recent project for the current user.
     Used by frontend to resume after refresh.
@@ -78,24 +168,42 @@ def get_latest_project(request: Request, db: Session = Depends(get_db)):
 
     p = q.first()
 
-    return {
+    out = {
         "project": (
             {
                 "id": p.id,
                 "name": p.name,
                 "created_at": p.created_at.isoformat() if getattr(p, "created_at", None) else None,
+                "revision": p.revision,
+                "card_count": p.card_count,
             }
             if p
             else None
         )
     }
 
+    etag = body_etag(out)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    set_etag(response, etag)
+    return out
+
 
 @router.get("/{project_id}/cards")
-def get_project_cards(project_id: int, request: Request, db: Session = Depends(get_db)):
+def get_project_cards(
+    project_id: int,
+    request: Request,
+    response: Response,
+    limit: int | None = Query(default=None, ge=1),
+    after: int | None = None,
+    fields: str | None = None,
+    db: Session = Depends(get_db),
+):
     """
     Returns all cards for a project (must belong to current user).
     Used by frontend to resume cards after refresh.
+    Supports the same limit / after / fields paging and ETag / 304 as GET /cards/{project_id}.
     """
     uid = require_user_id(request)
 
@@ -103,24 +211,126 @@ def get_project_cards(project_id: int, request: Request, db: Session = Depends(g
     if not p:
         # Keep response shape consistent but indicate not found
         # (frontend will silently ignore if it can't resume)
-        return {"cards": []}
-
-    cards = db.query(Card).filter(Card.project_id == project_id).order_by(Card.id.asc()).all()
-
-    def ser(c: Card):
-        # Use getattr so this won't crash if AI fields aren't present on your model yet.
-        return {
-            "id": c.id,
-            "project_id": c.project_id,
-            "card_type": c.card_type,
-            "front": c.front,
-            "back": c.back,
-            "raw": getattr(c, "raw", None),
-            "ai_changed": getattr(c, "ai_changed", None),
-            "ai_flag": getattr(c, "ai_flag", None),
-            "ai_feedback": getattr(c, "ai_feedback", None),
-            "ai_suggest_front": getattr(c, "ai_suggest_front", None),
-            "ai_suggest_back": getattr(c, "ai_suggest_back", None),
-        }
+        return {"cards": [], "next_cursor": None}
+
+    try:
+        cols = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if limit is not None:
+        limit = min(limit, settings.CARDS_PAGE_MAX)
+
+    etag = make_etag("cards", p.id, p.revision, limit, after, ",".join(cols))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    set_etag(response, etag)
+
+    cards, next_cursor = list_cards_page(db, project_id, cols, limit, after)
+    return {"cards": cards, "next_cursor": next_cursor}
+
+
+@router.get("/{project_id}/changes")
+def get_project_changes(
+    project_id: int,
+    request: Request,
+    since: int = Query(ge=0),
+    limit: int | None = Query(default=None, ge=1),
+    after: int | None = None,
+    fields: str | None = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Delta sync: the cards written and the card ids deleted since project revision `since`.
+    Clients keep a local copy plus the last `revision` they saw, and pass it back as `since`.
+
+    reset=true means the local copy can't be patched (first sync with since=0, or the
+    project's cards were replaced wholesale since then): drop it and take `cards` as the
+    full set. Otherwise apply `deleted` first, then upsert `cards` by id.
+    limit / after / fields page the cards like GET /cards/{project_id}; `deleted` comes with
+    the first page only. When paging, keep the `revision` of the first page as the next `since`.
+    """
+    uid = require_user_id(request)
+
+    p = db.query(Project).filter(Project.id == project_id, Project.owner_id == uid).first()
+    if not p:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    try:
+        cols = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if limit is not None:
+        limit = min(limit, settings.CARDS_PAGE_MAX)
+
+    # a since ahead of the project (e.g. a restored database) can't be trusted either
+    reset = since == 0 or since < p.reset_revision or since > p.revision
+    cards, next_cursor = list_cards_page(db, project_id, cols, limit, after, None if reset else since)
+    deleted = [] if reset or after is not None else deleted_since(db, project_id, since)
+
+    return {
+        "project_id": p.id,
+        "revision": p.revision,
+        "since": since,
+        "reset": reset,
+        "cards": cards,
+        "deleted": deleted,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.post("/{project_id}/import")
+def import_markdown(
+    project_id: int,
+    request: Request,
+    file: UploadFile = File(...),
+    replace: bool = True,
+    sync: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Upload a Markdown export (multipart field "file") and parse it server-side.
+    The upload is spooled by the framework, then read line by line through parser_md.iter_cards
+    and inserted in batches of IMPORT_BATCH_SIZE, so memory stays flat however big the file is.
+
+    replace=true (default) swaps out the project's cards, like POST /cards; replace=false appends.
+    sync=true re-imports an edited export instead: only changed cards are written, and unchanged
+    ones keep their ids and AI results (see services/md_import.sync_cards).
+    Returns counts only; fetch the cards with GET /cards/{project_id}.
+    """
+    uid = require_user_id(request)
+
+    proj = db.query(Project).filter(Project.id == project_id, Project.owner_id == uid).first()
+    if not proj:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if file.size is not None and file.size > settings.IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    rev = bump_revision(db, project_id)
+    if replace and not sync:
+        reset_cards(db, project_id, rev)
+
+    # utf-8-sig drops the BOM some editors add; newline=None handles \r\n exports
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", errors="replace", newline=None)
+
+    counts = None
+    try:
+        if sync:
+            counts = sync_cards(db, project_id, iter_cards(lines), rev)
+            imported = counts["inserted"]
+        else:
+            imported = insert_cards(db, project_id, iter_cards(lines), rev)
+    finally:
+        lines.detach()
+
+    # one commit: a failed upload leaves the project as it was
+    db.commit()
 
-    return {"cards": [ser(c) for c in cards]}
+    total = db.scalar(select(Project.card_count).where(Project.id == project_id))
+    out = {"ok": True, "project_id": project_id, "imported": imported, "total": total}
+    if counts is not None:
+        out["sync"] = counts
+    return out
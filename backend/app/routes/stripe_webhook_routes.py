@@ -2,10 +2,12 @@ from __future__ import annotations
 
 import stripe
 from fastapi import APIRouter, Request, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from ..config import settings
-from ..db import get_db
+from ..db import get_async_db
 from ..models import User
 from ..services.stripe_service import PRICE_TO_PLAN
 
@@ -14,7 +16,7 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
 @router.post("/webhook")
-async def webhook(request: Request, db: Session = Depends(get_db)):
+async def webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     sig = request.headers.get("stripe-signature")
     if not sig:
         raise HTTPException(status_code=400, detail="Missing stripe-signature")
@@ -36,16 +38,14 @@ async def webhook(request: Request, db: Session = Depends(get_db)):
         customer_id = obj.get("customer")
         email = (obj.get("customer_details") or {}).get("email") or obj.get("customer_email")
 
-        user = None
-        if email:
-            user = db.query(User).filter(User.email == email.lower()).first()
-
-        if user and customer_id:
-            user.stripe_customer_id = customer_id
-
-            # Retrieve session with line items to detect price_id and plan
+        # Retrieve session with line items to detect price_id and plan, before touching the
+        # database: the Stripe SDK is blocking (threadpool) and no DB connection should be held
+        # while it waits on the network
+        plan = None
+        if email and customer_id:
             try:
-                sess = stripe.checkout.Session.retrieve(
+                sess = await run_in_threadpool(
+                    stripe.checkout.Session.retrieve,
                     obj.get("id"),
                     expand=["line_items.data.price"],
                 )
@@ -54,13 +54,20 @@ async def webhook(request: Request, db: Session = Depends(get_db)):
                 if items:
                     price_id = ((items[0].get("price") or {}).get("id"))  # price_xxx
                 plan = PRICE_TO_PLAN.get(price_id, "free")
-                user.plan = plan
             except Exception:
                 # Even if this fails, customer linking still helps subscription events later
                 pass
 
+        user = None
+        if email:
+            user = await db.scalar(select(User).where(User.email == email.lower()))
+
+        if user and customer_id:
+            user.stripe_customer_id = customer_id
+            if plan is not None:
+                user.plan = plan
             db.add(user)
-            db.commit()
+            await db.commit()
 
     # --- 2) Subscription lifecycle: keep in sync (authoritative) ---
     if etype in (
@@ -77,10 +84,12 @@ async def webhook(request: Request, db: Session = Depends(get_db)):
         plan = PRICE_TO_PLAN.get(price_id, "free")
         status = obj.get("status")
 
-        user = db.query(User).filter(User.stripe_customer_id == customer_id).first() if customer_id else None
+        user = (
+            await db.scalar(select(User).where(User.stripe_customer_id == customer_id)) if customer_id else None
+        )
         if user:
             user.plan = plan if status in ("active", "trialing") else "free"
             db.add(user)
-            db.commit()
+            await db.commit()
 
     return {"ok": True}
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Sequence, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from ..db import AsyncSessionLocal
+from ..models import Card, User
+from .ai_review import AIMode, AIResult, pack_cards, review_card, review_cards_packed
+from .cards_store import bump_revisions_for_cards
+from .entitlements import consume_ai
+from . import review_cache
+
+# (card_id, front, back)
+CardText = Tuple[int, str, str]
+
+# (card_id, result, error) - exactly one of result / error is set
+CardOutcome = Tuple[int, "AIResult | None", "str | None"]
+
+
+def is_incorrect_flag(flag: str | None) -> bool:
+    f = (flag or "").strip().lower()
+    return f == "incorrect" or f == "wrong" or "incorrect" in f
+
+
+def card_values_for_result(result: AIResult, apply: bool = False, review_hash: str | None = None) -> dict:
+    """
+    Column values to store on a Card for an AI result.
+    Shared by the single-card and batch review paths so both follow the same trust rules.
+    review_hash records which text/variant/mode the result belongs to (see stored_result).
+    """
+    flag = result.get("flag")
+
+    values = {
+        "ai_changed": bool(result.get("changed", False)),
+        "ai_flag": flag,
+        "ai_feedback": result.get("feedback"),
+        "ai_review_hash": review_hash,
+    }
+
+    if is_incorrect_flag(flag):
+        # Critical trust rule: do NOT store hallucinated "replacements" when incorrect.
+        # Also never apply.
+        values["ai_suggest_front"] = None
+        values["ai_suggest_back"] = None
+        return values
+
+    values["ai_suggest_front"] = result.get("front")
+    values["ai_suggest_back"] = result.get("back")
+
+    if apply and result.get("changed"):
+        values["front"] = result.get("front")
+        values["back"] = result.get("back")
+
+    return values
+
+
+def stored_result(card) -> AIResult | None:
+    """
+    The AIResult last written to a card (a Card or a row with the same ai_* attributes),
+    or None if it was never reviewed.
+    """
+    if not card.ai_review_hash or card.ai_flag is None:
+        return None
+    return AIResult(
+        changed=bool(card.ai_changed),
+        flag=card.ai_flag,
+        feedback=card.ai_feedback or "",
+        front=card.ai_suggest_front if card.ai_suggest_front is not None else card.front,
+        back=card.ai_suggest_back if card.ai_suggest_back is not None else card.back,
+    )
+
+
+async def review_many(
+    cards: Sequence[CardText],
+    variant: str,
+    mode: AIMode,
+    concurrency: int,
+    packed: bool = False,
+    fused: bool | None = None,
+) -> AsyncIterator[CardOutcome]:
+    """
+    Run review_card over many cards with at most `concurrency` requests in flight.
+    With packed=True, cards are grouped (AI_PACK_SIZE / AI_PACK_TOKEN_BUDGET) and each
+    group shares one request per pass.
+    Yields outcomes in completion order (not input order).
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(pack: list[CardText]) -> list[CardOutcome]:
+        try:
+            if packed:
+                # takes a slot per request itself: its single-card fallbacks each need their own
+                results = await review_cards_packed(pack, variant, mode, fused, limit=sem)
+            else:
+                (card_id, front, back), = pack
+                async with sem:
+                    results = {card_id: await review_card(front, back, variant, mode, fused)}
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            return [(card_id, None, error) for card_id, _, _ in pack]
+        return [(card_id, results[card_id], None) for card_id, _, _ in pack]
+
+    packs = pack_cards(cards) if packed else [[c] for c in cards]
+    tasks = [asyncio.create_task(one(p)) for p in packs]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            for outcome in await fut:
+                yield outcome
+    finally:
+        # Client went away (or we errored): don't keep paying for calls nobody will see.
+        for t in tasks:
+            t.cancel()
+
+
+class BatchWriter:
+    """
+    Buffers AI results and writes them back in bulk:
+    one UPDATE ... executemany + one usage commit per flush instead of one commit per card.
+    Fresh (uncached) results are also stored in the review cache and count against quota.
+
+    Uses its own (async) session because a streaming response outlives the request's session.
+    """
+
+    def __init__(self, user_id: int, apply: bool, flush_every: int = 50):
+        self.user_id = user_id
+        self.apply = apply
+        self.flush_every = max(1, flush_every)
+        self.pending: list[dict] = []
+        self.fresh: dict[str, AIResult] = {}
+        self.charge = 0
+        self.used: int | None = None
+
+    async def add(self, card_id: int, result: AIResult, cache_key: str | None = None, cached: bool = False) -> None:
+        self.pending.append({"id": card_id, **card_values_for_result(result, self.apply, cache_key)})
+        if not cached:
+            self.charge += 1
+            if cache_key:
+                self.fresh[cache_key] = result
+        if len(self.pending) >= self.flush_every:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+
+        rows, self.pending = self.pending, []
+        fresh, self.fresh = self.fresh, {}
+        charge, self.charge = self.charge, 0
+
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(self._write, rows, fresh, charge)
+
+    def _write(self, db: Session, rows: list[dict], fresh: dict[str, AIResult], charge: int) -> None:
+        # Only rows that actually apply carry front/back, so group by key set
+        # (bulk UPDATE by primary key needs uniform parameter sets).
+        groups: dict[tuple, list[dict]] = {}
+        for r in rows:
+            groups.setdefault(tuple(sorted(r)), []).append(r)
+        for group in groups.values():
+            db.execute(update(Card), group)
+        bump_revisions_for_cards(db, [r["id"] for r in rows])
+
+        review_cache.put_many(db, fresh)
+
+        user = db.query(User).filter(User.id == self.user_id).first()
+        if user and charge:
+            # consume_ai commits, so the card updates land in the same transaction
+            consume_ai(db, user, charge)
+            self.used = user.usage_count
+        else:
+            db.commit()
@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import AIJob, AIJobItem, Card, User
+from .ai_batch import card_values_for_result
+from .ai_review import AIResult, review_card
+from .cards_store import bump_revisions_for_cards
+from .entitlements import can_use_ai, consume_ai
+from . import review_cache
+
+log = logging.getLogger("n2a.worker")
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+OPEN_ITEM_STATUSES = ("pending", "running")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ---------------------------------------------------------------------
+# Job bookkeeping (used by routes)
+# ---------------------------------------------------------------------
+def create_job(
+    db: Session,
+    *,
+    owner_id: int,
+    project_id: int,
+    card_ids: list[int],
+    variant: str,
+    mode: str,
+    apply: bool,
+    fused: bool,
+) -> AIJob:
+    job = AIJob(
+        owner_id=owner_id,
+        project_id=project_id,
+        status="queued" if card_ids else "done",
+        variant=variant,
+        mode=mode,
+        apply=apply,
+        fused=fused,
+        total=len(card_ids),
+    )
+    db.add(job)
+    db.flush()
+
+    if card_ids:
+        db.execute(
+            AIJobItem.__table__.insert(),
+            [{"job_id": job.id, "card_id": cid, "status": "pending", "attempts": 0, "cached": False} for cid in card_ids],
+        )
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def item_counts(db: Session, job_id: int) -> dict[str, int]:
+    counts = {s: 0 for s in ("pending", "running", "done", "failed", "cancelled")}
+    rows = (
+        db.query(AIJobItem.status, func.count(AIJobItem.id))
+        .filter(AIJobItem.job_id == job_id)
+        .group_by(AIJobItem.status)
+        .all()
+    )
+    for status, n in rows:
+        counts[status] = int(n)
+    return counts
+
+
+def cancel_job(db: Session, job: AIJob) -> None:
+    """
+    Stop handing out the job's items. Items already in flight finish normally.
+    """
+    job.status = "cancelled"
+    db.execute(
+        update(AIJobItem)
+        .where(AIJobItem.job_id == job.id, AIJobItem.status == "pending")
+        .values(status="cancelled")
+    )
+    db.add(job)
+    db.commit()
+
+
+def resume_job(db: Session, job: AIJob) -> int:
+    """
+    Re-queue everything that didn't finish: cancelled items and failed ones (with a fresh retry budget).
+    Returns how many items were re-queued; with none, the job is left as it is.
+    """
+    reset = db.execute(
+        update(AIJobItem)
+        .where(AIJobItem.job_id == job.id, AIJobItem.status.in_(("cancelled", "failed")))
+        .values(status="pending", attempts=0, available_at=None, error=None)
+    ).rowcount
+    if not reset:
+        db.rollback()
+        return 0
+    job.status = "queued"
+    db.add(job)
+    db.commit()
+    return reset
+
+
+# ---------------------------------------------------------------------
+# Claiming
+# ---------------------------------------------------------------------
+def _claimable():
+    now = _now()
+    return (
+        select(AIJobItem.id)
+        .join(AIJob, AIJob.id == AIJobItem.job_id)
+        .where(AIJobItem.status == "pending")
+        .where(AIJob.status.in_(ACTIVE_JOB_STATUSES))
+        .where(or_(AIJobItem.available_at.is_(None), AIJobItem.available_at <= now))
+        .order_by(AIJobItem.id.asc())
+    )
+
+
+def requeue_stale(db: Session) -> None:
+    """
+    Items claimed by a worker that died never finish; hand them out again.
+    Every claim counts as an attempt, so an item that keeps taking its worker down fails
+    once it has used up AI_JOB_MAX_ATTEMPTS, like an item that keeps erroring.
+    """
+    now = _now()
+    cutoff = now - timedelta(seconds=settings.AI_JOB_STALE_SECONDS)
+    stale = and_(AIJobItem.status == "running", AIJobItem.claimed_at < cutoff)
+    job_ids = db.execute(
+        update(AIJobItem)
+        .where(stale, AIJobItem.attempts >= settings.AI_JOB_MAX_ATTEMPTS)
+        .values(status="failed", error="worker lost the item too many times", finished_at=now)
+        .returning(AIJobItem.job_id)
+    ).scalars().all()
+    db.execute(update(AIJobItem).where(stale).values(status="pending"))
+
+    # a job whose last open item just failed is finished
+    for job_id in set(job_ids):
+        open_left = db.scalar(
+            select(func.count(AIJobItem.id))
+            .where(AIJobItem.job_id == job_id, AIJobItem.status.in_(OPEN_ITEM_STATUSES))
+        )
+        if not open_left:
+            db.execute(
+                update(AIJob)
+                .where(AIJob.id == job_id, AIJob.status.in_(ACTIVE_JOB_STATUSES))
+                .values(status="done")
+            )
+    db.commit()
+
+
+def claim_items(db: Session, limit: int) -> list[int]:
+    """
+    Atomically move up to `limit` pending items to running and return their ids.
+
+    Postgres: SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never block on
+    or double-claim the same rows.
+    SQLite (no row locks): conditional UPDATE per candidate; writes are serialised,
+    so only the worker whose UPDATE still sees status='pending' gets the row.
+    """
+    now = _now()
+    claim = dict(status="running", claimed_at=now, attempts=AIJobItem.attempts + 1)
+
+    if db.get_bind().dialect.name == "postgresql":
+        ids = list(db.execute(_claimable().limit(limit).with_for_update(skip_locked=True, of=AIJobItem)).scalars())
+        if ids:
+            db.execute(update(AIJobItem).where(AIJobItem.id.in_(ids)).values(**claim))
+    else:
+        ids = []
+        for item_id in db.execute(_claimable().limit(limit * 2)).scalars():
+            res = db.execute(
+                update(AIJobItem)
+                .where(AIJobItem.id == item_id, AIJobItem.status == "pending")
+                .values(**claim)
+            )
+            if res.rowcount == 1:
+                ids.append(item_id)
+            if len(ids) >= limit:
+                break
+
+    if ids:
+        job_ids = select(AIJobItem.job_id).where(AIJobItem.id.in_(ids))
+        db.execute(update(AIJob).where(AIJob.id.in_(job_ids), AIJob.status == "queued").values(status="running"))
+    db.commit()
+    return ids
+
+
+# ---------------------------------------------------------------------
+# Processing
+# ---------------------------------------------------------------------
+def _is_transient(e: Exception) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        code = e.response.status_code
+        return code == 429 or code >= 500
+    return isinstance(e, (httpx.TimeoutException, httpx.TransportError))
+
+
+def _load(item_id: int):
+    """
+    Everything the review needs, or an error string. Also resolves cache hits and quota up front.
+    """
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(AIJobItem, AIJob, Card)
+            .join(AIJob, AIJob.id == AIJobItem.job_id)
+            .outerjoin(Card, and_(Card.id == AIJobItem.card_id, Card.project_id == AIJob.project_id))
+            .filter(AIJobItem.id == item_id)
+            .first()
+        )
+        if not row:
+            return None
+        item, job, card = row
+        if card is None:
+            return {"error": "Card not found"}
+
+        key = review_cache.cache_key(card.front, card.back, job.variant, job.mode, job.fused)
+        hit = review_cache.get(db, key)
+        if hit is None:
+            user = db.query(User).filter(User.id == job.owner_id).first()
+            ok, used, limit = can_use_ai(db, user) if user else (False, 0, 0)
+            if not ok:
+                return {"error": f"AI limit reached ({used}/{limit})"}
+
+        return {
+            "job_id": job.id,
+            "owner_id": job.owner_id,
+            "card_id": card.id,
+            "front": card.front,
+            "back": card.back,
+            "variant": job.variant,
+            "mode": job.mode,
+            "apply": job.apply,
+            "fused": job.fused,
+            "key": key,
+            "hit": hit,
+            "attempts": item.attempts,
+        }
+    finally:
+        db.close()
+
+
+def _finish(item_id: int, *, status: str, result: AIResult | None = None, ctx: dict | None = None,
+            error: str | None = None, retry_in: float | None = None) -> None:
+    """
+    Record an item's outcome; on success write the card, cache and usage in the same transaction.
+    """
+    db = SessionLocal()
+    try:
+        item = db.query(AIJobItem).filter(AIJobItem.id == item_id).first()
+        if not item:
+            return
+
+        if retry_in is not None:
+            item.status = "pending"
+            item.available_at = _now() + timedelta(seconds=retry_in)
+            item.error = error
+            db.add(item)
+            db.commit()
+            return
+
+        item.status = status
+        item.error = error
+        item.finished_at = _now()
+        db.add(item)
+
+        user = None
+        if result is not None and ctx is not None:
+            cached = ctx["hit"] is not None
+            item.flag = result.get("flag")
+            item.cached = cached
+
+            db.execute(
+                update(Card)
+                .where(Card.id == ctx["card_id"])
+                .values(**card_values_for_result(result, ctx["apply"], ctx["key"]))
+            )
+            bump_revisions_for_cards(db, [ctx["card_id"]])
+            if not cached:
+                review_cache.put(db, ctx["key"], result)
+                user = db.query(User).filter(User.id == ctx["owner_id"]).first()
+
+        if user:
+            consume_ai(db, user, 1)  # commits the card/item/cache writes too
+        else:
+            db.commit()
+
+        # Last open item -> job done
+        open_left = (
+            db.query(func.count(AIJobItem.id))
+            .filter(AIJobItem.job_id == item.job_id, AIJobItem.status.in_(OPEN_ITEM_STATUSES))
+            .scalar()
+        )
+        if not open_left:
+            db.execute(
+                update(AIJob)
+                .where(AIJob.id == item.job_id, AIJob.status.in_(ACTIVE_JOB_STATUSES))
+                .values(status="done")
+            )
+            db.commit()
+    finally:
+        db.close()
+
+
+async def process_item(item_id: int) -> None:
+    ctx = await asyncio.to_thread(_load, item_id)
+    if ctx is None:
+        return
+    if "error" in ctx:
+        await asyncio.to_thread(_finish, item_id, status="failed", error=ctx["error"])
+        return
+
+    if ctx["hit"] is not None:
+        await asyncio.to_thread(_finish, item_id, status="done", result=ctx["hit"], ctx=ctx)
+        return
+
+    try:
+        result = await review_card(ctx["front"], ctx["back"], ctx["variant"], ctx["mode"], ctx["fused"])
+    except Exception as e:
+        error = str(e) or e.__class__.__name__
+        if _is_transient(e) and ctx["attempts"] < settings.AI_JOB_MAX_ATTEMPTS:
+            # jittered exponential backoff: ~2s, 4s, 8s ...
+            delay = (2 ** ctx["attempts"]) * (0.5 + random.random())
+            await asyncio.to_thread(_finish, item_id, status="pending", error=error, retry_in=delay)
+        else:
+            await asyncio.to_thread(_finish, item_id, status="failed", error=error)
+        return
+
+    await asyncio.to_thread(_finish, item_id, status="done", result=result, ctx=ctx)
+
+
+def _claim_batch(limit: int) -> list[int]:
+    db = SessionLocal()
+    try:
+        requeue_stale(db)
+        return claim_items(db, limit)
+    finally:
+        db.close()
+
+
+def _prune_cache() -> None:
+    db = SessionLocal()
+    try:
+        review_cache.prune(db)
+    finally:
+        db.close()
+
+
+async def run_worker(stop: asyncio.Event | None = None) -> None:
+    """
+    Claim and process job items until `stop` is set (or forever).
+    Also trims the review cache every AI_CACHE_PRUNE_SECONDS, away from the request path.
+    Safe to run in several processes at once.
+    """
+    stop = stop or asyncio.Event()
+    concurrency = max(1, settings.AI_JOB_CONCURRENCY)
+    log.info("AI job worker started (concurrency=%s)", concurrency)
+
+    # claim only as many items as there are free slots, and refill a slot as soon as its item
+    # finishes, so one slow card doesn't hold the others idle
+    running: dict[asyncio.Task, int] = {}
+    waiter = asyncio.create_task(stop.wait())
+    next_prune = time.monotonic()
+    try:
+        while not stop.is_set():
+            if time.monotonic() >= next_prune:
+                next_prune = time.monotonic() + settings.AI_CACHE_PRUNE_SECONDS
+                try:
+                    await asyncio.to_thread(_prune_cache)
+                except Exception:
+                    log.exception("pruning the AI review cache failed")
+
+            free = concurrency - len(running)
+            ids: list[int] = []
+            if free:
+                try:
+                    ids = await asyncio.to_thread(_claim_batch, free)
+                except Exception:
+                    log.exception("claiming AI job items failed")
+            for item_id in ids:
+                running[asyncio.create_task(process_item(item_id))] = item_id
+
+            # nothing to claim: wait for a slot or the next poll; all slots busy: wait for a slot
+            timeout = None if len(running) == concurrency else settings.AI_JOB_POLL_SECONDS
+            if ids and timeout is not None:
+                continue
+            done, _ = await asyncio.wait(
+                [*running, waiter], timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done - {waiter}:
+                item_id = running.pop(task)
+                if not task.cancelled() and task.exception() is not None:
+                    log.error("AI job item %s crashed: %r", item_id, task.exception())
+
+        # let in-flight items finish; they'd only be re-claimed as stale otherwise
+        if running:
+            await asyncio.wait(running)
+    finally:
+        # cancelled from outside: nothing left running here (cut-off items come back as stale)
+        for task in (waiter, *running):
+            task.cancel()
+
+    log.info("AI job worker stopped")
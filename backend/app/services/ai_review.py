@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import httpx
-from typing import Literal, TypedDict
+from functools import partial
+from typing import AsyncIterator, Literal, Sequence, Tuple, TypedDict
 from ..config import settings
+from .openai_client import get_client
+from .rate_limit import backoff_seconds, get_limiter, is_retryable_status, retry_after_seconds
 
 AIMode = Literal["content", "format", "both"]
 
+# (card_id, front, back) for packed reviews
+PackedCard = Tuple[int, str, str]
+
 class AIResult(TypedDict):
     changed: bool
     flag: str
@@ -114,6 +122,58 @@ changed, flag, feedback, front, back
 """
 
 
+SYSTEM_PROMPT_BOTH = f"""You are reviewing AND formatting flashcards for spaced-repetition learning (Anki-style readability).
+Do this in TWO STAGES inside one answer.
+
+STAGE 1 - CONTENT (on the original card):
+CRITICAL RULES (must follow):
+- DO NOT add new information
+- DO NOT expand answers
+- DO NOT invent examples
+- DO NOT change meaning
+
+{INCORRECT_CONTENT_POLICY}
+{LANGUAGE_VARIANT_POLICY}
+
+You MAY (only if needed, without changing meaning):
+- Fix typos/grammar consistent with the requested variant
+- Rephrase wording ONLY if confusing or ambiguous
+
+If the card is already clear and correct:
+- changed=false
+- flag="ok"
+- return original text unchanged
+
+STAGE 2 - FORMAT (on the STAGE 1 output, skip if STAGE 1 flag is "incorrect"):
+- DO NOT add, remove or change information; DO NOT assess correctness
+- DO NOT perform language variant normalisation
+- Improve structure, spacing, bullets, readability
+- Preserve equations, symbols, units
+- Use simple Markdown suitable for Anki
+- Prefer skimmable backs: short lines, bullets, simple labels
+- flag = "format_changed" or "format_ok"
+
+Return ONLY valid JSON of the form:
+{{"content": {{"changed": ..., "flag": ..., "feedback": ..., "front": ..., "back": ...}},
+ "format": {{"changed": ..., "flag": ..., "feedback": ..., "front": ..., "back": ...}}}}
+"""
+
+
+PACKED_INSTRUCTIONS = """MULTIPLE CARDS:
+- You will receive several flashcards, each with an "id".
+- Apply ALL rules above to EACH card independently.
+- Return ONLY valid JSON of the form:
+  {"cards": [{"id": <id>, "changed": ..., "flag": ..., "feedback": ..., "front": ..., "back": ...}, ...]}
+- Return exactly one entry per input card, using the same id.
+"""
+
+
+# Changes whenever a prompt changes, so cached reviews from older prompts aren't reused.
+PROMPT_VERSION = hashlib.sha256(
+    (SYSTEM_PROMPT_CONTENT + SYSTEM_PROMPT_FORMAT + SYSTEM_PROMPT_BOTH + PACKED_INSTRUCTIONS).encode("utf-8")
+).hexdigest()[:12]
+
+
 def _extract_output_text(resp_json: dict, fallback: str) -> str:
     text = None
     for item in resp_json.get("output", []):
@@ -127,131 +187,301 @@ def _extract_output_text(resp_json: dict, fallback: str) -> str:
     return text or fallback
 
 
-async def _call_ai(front: str, back: str, variant: str, mode: AIMode) -> AIResult:
-    """
-    Low-level AI call. mode is only 'content' or 'format' here.
-    """
-    norm_variant = _norm_variant(variant)
+def _system_prompt(mode: AIMode) -> str:
+    return SYSTEM_PROMPT_CONTENT if mode == "content" else SYSTEM_PROMPT_FORMAT
 
-    system_prompt = SYSTEM_PROMPT_CONTENT if mode == "content" else SYSTEM_PROMPT_FORMAT
 
-    url = "https://api.openai.com/v1/responses"
+def _responses_request(system_prompt: str, user_content: str, stream: bool = False) -> tuple[str, dict, dict]:
+    url = settings.OPENAI_BASE_URL.rstrip("/") + "/responses"
     headers = {"Authorization": f"Bearer {settings.OPENAI_API_KEY}", "Content-Type": "application/json"}
 
     payload = {
         "model": settings.OPENAI_MODEL,
         "input": [
             {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": (
-                    f"Language variant: {norm_variant}\n"
-                    f"Mode: {mode}\n\n"
-                    f"Front:\n{front}\n\n"
-                    f"Back:\n{back}\n"
-                ),
-            },
+            {"role": "user", "content": user_content},
         ],
         "text": {"format": {"type": "json_object"}},
         "temperature": 0.2,
     }
+    if stream:
+        payload["stream"] = True
+
+    return url, headers, payload
+
+
+async def _post_responses(system_prompt: str, user_content: str) -> dict:
+    url, headers, payload = _responses_request(system_prompt, user_content)
+
+    limiter = get_limiter()
+    # prompt + a similar-sized answer; reconciled with the real usage afterwards
+    est_tokens = 2 * _estimate_tokens(system_prompt + user_content)
+
+    attempts = max(0, settings.OPENAI_MAX_RETRIES) + 1
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        try:
+            async with limiter.slot(est_tokens):
+                r = await get_client().post(url, headers=headers, json=payload)
+        except (httpx.TimeoutException, httpx.TransportError):
+            if last:
+                raise
+            await asyncio.sleep(backoff_seconds(attempt))
+            continue
+
+        if is_retryable_status(r.status_code) and not last:
+            retry_after = retry_after_seconds(r)
+            if r.status_code == 429:
+                limiter.on_throttle(retry_after)
+            await asyncio.sleep(retry_after if retry_after is not None else backoff_seconds(attempt))
+            continue
 
-    async with httpx.AsyncClient(timeout=35) as client:
-        r = await client.post(url, headers=headers, json=payload)
         r.raise_for_status()
         data = r.json()
+        usage = data.get("usage") or {}
+        limiter.on_success(est_tokens, usage.get("total_tokens"))
+        return data
 
+    raise RuntimeError("unreachable")
+
+
+async def _stream_responses(system_prompt: str, user_content: str) -> AsyncIterator[tuple[str, object]]:
+    """
+    Streaming variant of _post_responses. Yields ("delta", text) as output text arrives
+    and finally ("done", response_json) with the same shape _post_responses returns.
+
+    Retries (like _post_responses) only happen before the first byte is forwarded.
+    """
+    url, headers, payload = _responses_request(system_prompt, user_content, stream=True)
+
+    limiter = get_limiter()
+    est_tokens = 2 * _estimate_tokens(system_prompt + user_content)
+
+    attempts = max(0, settings.OPENAI_MAX_RETRIES) + 1
+    forwarded = False
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        retry_in: float | None = None
+        try:
+            async with limiter.slot(est_tokens):
+                async with get_client().stream("POST", url, headers=headers, json=payload) as r:
+                    if is_retryable_status(r.status_code) and not last:
+                        retry_after = retry_after_seconds(r)
+                        if r.status_code == 429:
+                            limiter.on_throttle(retry_after)
+                        retry_in = retry_after if retry_after is not None else backoff_seconds(attempt)
+                    else:
+                        if r.is_error:
+                            await r.aread()
+                        r.raise_for_status()
+
+                        text_parts: list[str] = []
+                        final: dict | None = None
+                        async for line in r.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if not data or data == "[DONE]":
+                                continue
+                            try:
+                                ev = json.loads(data)
+                            except ValueError:
+                                continue
+                            etype = ev.get("type")
+                            if etype == "response.output_text.delta":
+                                delta = ev.get("delta") or ""
+                                text_parts.append(delta)
+                                forwarded = True
+                                yield "delta", delta
+                            elif etype == "response.completed":
+                                final = ev.get("response") or {}
+                            elif etype in ("response.failed", "error"):
+                                raise RuntimeError(str((ev.get("response") or ev).get("error") or "AI stream failed"))
+
+                        if final is None:
+                            # stream ended without a completed event: rebuild from the deltas
+                            final = {"output": [{"type": "message", "content": [{"type": "output_text", "text": "".join(text_parts)}]}]}
+                        usage = final.get("usage") or {}
+                        limiter.on_success(est_tokens, usage.get("total_tokens"))
+                        yield "done", final
+                        return
+        except (httpx.TimeoutException, httpx.TransportError):
+            # the client already saw part of this answer: a retry would repeat it
+            if last or forwarded:
+                raise
+            retry_in = backoff_seconds(attempt)
+
+        await asyncio.sleep(retry_in or 0)
+
+    raise RuntimeError("unreachable")
+
+
+def _to_result(obj: dict, front: str, back: str) -> AIResult:
+    return AIResult(
+        changed=bool(obj.get("changed", False)),
+        flag=str(obj.get("flag", "ok")).strip() or "ok",
+        feedback=str(obj.get("feedback", "")),
+        front=str(obj.get("front", front)),
+        back=str(obj.get("back", back)),
+    )
+
+
+def _user_content(front: str, back: str, variant: str, mode: str) -> str:
+    return (
+        f"Language variant: {_norm_variant(variant)}\n"
+        f"Mode: {mode}\n\n"
+        f"Front:\n{front}\n\n"
+        f"Back:\n{back}\n"
+    )
+
+
+def _parse_single(data: dict, front: str, back: str) -> AIResult:
     fallback = json.dumps({"changed": False, "flag": "ok", "feedback": "", "front": front, "back": back})
     text = _extract_output_text(data, fallback)
 
     try:
-        obj = json.loads(text)
-        return AIResult(
-            changed=bool(obj.get("changed", False)),
-            flag=str(obj.get("flag", "ok")).strip() or "ok",
-            feedback=str(obj.get("feedback", "")),
-            front=str(obj.get("front", front)),
-            back=str(obj.get("back", back)),
-        )
+        return _to_result(json.loads(text), front, back)
     except Exception:
         return AIResult(changed=False, flag="parse_error", feedback="AI returned invalid JSON", front=front, back=back)
 
 
-def _actually_changed(a_front: str, a_back: str, b_front: str, b_back: str) -> bool:
-    return (a_front != (b_front or "")) or (a_back != (b_back or ""))
+def _parse_fused(data: dict, front: str, back: str) -> tuple[AIResult, AIResult] | None:
+    try:
+        obj = json.loads(_extract_output_text(data, ""))
+        c, f = obj["content"], obj.get("format")
+        content_res = _to_result(c, front, back)
+        if content_res["flag"].lower() == "incorrect":
+            return content_res, content_res
+        if not isinstance(f, dict):
+            return None
+        return content_res, _to_result(f, content_res["front"], content_res["back"])
+    except Exception:
+        return None
 
 
-async def review_card(front: str, back: str, variant: str = "en-AU", mode: AIMode = "content") -> AIResult:
-    if not settings.OPENAI_API_KEY:
-        return AIResult(changed=False, flag="ai_disabled", feedback="AI key not configured", front=front, back=back)
+async def _call_ai(front: str, back: str, variant: str, mode: AIMode) -> AIResult:
+    """
+    Low-level AI call. mode is only 'content' or 'format' here.
+    """
+    data = await _post_responses(_system_prompt(mode), _user_content(front, back, variant, mode))
+    return _parse_single(data, front, back)
 
-    # -------------------------
-    # CONTENT ONLY
-    # -------------------------
-    if mode == "content":
-        res = await _call_ai(front, back, variant, "content")
 
-        # If incorrect: never change text
-        if res["flag"].lower() == "incorrect":
-            return AIResult(changed=False, flag="incorrect", feedback=res["feedback"].strip(), front=front, back=back)
-
-        # truth-check "changed"
-        if _actually_changed(res["front"], res["back"], front, back):
-            if not res["changed"]:
-                # force changed true if text differs
-                res["changed"] = True
-                if not res["feedback"].strip():
-                    res["feedback"] = "Content/spelling adjusted for clarity."
-        else:
-            res["changed"] = False
-            if res["flag"].lower() not in ("incorrect",):
-                res["flag"] = "ok"
+async def _call_ai_fused(front: str, back: str, variant: str) -> tuple[AIResult, AIResult] | None:
+    """
+    Low-level single-call 'both' review: returns (content_res, format_res) as if the two
+    passes had run separately, or None if the structured response can't be used.
+    """
+    data = await _post_responses(SYSTEM_PROMPT_BOTH, _user_content(front, back, variant, "both"))
+    return _parse_fused(data, front, back)
 
-        return res
 
-    # -------------------------
-    # FORMAT ONLY
-    # -------------------------
-    if mode == "format":
-        res = await _call_ai(front, back, variant, "format")
+async def _call_ai_packed(cards: Sequence[PackedCard], variant: str, mode: AIMode) -> dict[int, AIResult]:
+    """
+    Low-level packed AI call: several cards share one request (and one copy of the system prompt).
+    mode is only 'content' or 'format' here.
 
-        # truth-check "changed"
-        if _actually_changed(res["front"], res["back"], front, back):
-            if not res["changed"]:
-                res["changed"] = True
-            if res["flag"].lower() not in ("format_changed",):
-                res["flag"] = "format_changed"
-            if not res["feedback"].strip():
-                res["feedback"] = "Formatting changed for clarity."
-        else:
-            res["changed"] = False
-            res["flag"] = "format_ok"
-            if not res["feedback"].strip():
-                res["feedback"] = ""
+    Returns results keyed by card id. Entries that are missing or malformed are simply
+    absent, so callers can fall back to single-card calls for them.
+    """
+    norm_variant = _norm_variant(variant)
 
-        return res
+    data = await _post_responses(
+        _system_prompt(mode) + "\n" + PACKED_INSTRUCTIONS,
+        (
+            f"Language variant: {norm_variant}\n"
+            f"Mode: {mode}\n\n"
+            + json.dumps({"cards": [{"id": cid, "front": f, "back": b} for cid, f, b in cards]}, ensure_ascii=False)
+        ),
+    )
 
-    # -------------------------
-    # BOTH = 2-pass pipeline:
-    #   1) content (incl incorrect + variant)
-    #   2) format (on output of content)
-    # -------------------------
-    # Pass 1: content
-    content_res = await _call_ai(front, back, variant, "content")
+    text = _extract_output_text(data, "")
+    try:
+        obj = json.loads(text)
+    except Exception:
+        return {}
+
+    entries = obj.get("cards") if isinstance(obj, dict) else obj
+    if not isinstance(entries, list):
+        return {}
+
+    by_id = {cid: (f, b) for cid, f, b in cards}
+    out: dict[int, AIResult] = {}
+    for e in entries:
+        if not isinstance(e, dict):
+            continue
+        try:
+            cid = int(e.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if cid not in by_id or not all(k in e for k in ("flag", "front", "back")):
+            continue
+        f, b = by_id[cid]
+        try:
+            out[cid] = _to_result(e, f, b)
+        except Exception:
+            continue
+    return out
 
-    # If incorrect: STOP, do not format, do not change
-    if content_res["flag"].lower() == "incorrect":
-        return AIResult(changed=False, flag="incorrect", feedback=content_res["feedback"].strip(), front=front, back=back)
 
+def _actually_changed(a_front: str, a_back: str, b_front: str, b_back: str) -> bool:
+    return (a_front != (b_front or "")) or (a_back != (b_back or ""))
+
+
+def _finalise_content(res: AIResult, front: str, back: str) -> AIResult:
+    """
+    Truth-checks for a content pass against the text that was sent.
+    """
+    # If incorrect: never change text
+    if res["flag"].lower() == "incorrect":
+        return AIResult(changed=False, flag="incorrect", feedback=res["feedback"].strip(), front=front, back=back)
+
+    # truth-check "changed"
+    if _actually_changed(res["front"], res["back"], front, back):
+        if not res["changed"]:
+            # force changed true if text differs
+            res["changed"] = True
+            if not res["feedback"].strip():
+                res["feedback"] = "Content/spelling adjusted for clarity."
+    else:
+        res["changed"] = False
+        if res["flag"].lower() not in ("incorrect",):
+            res["flag"] = "ok"
+
+    return res
+
+
+def _finalise_format(res: AIResult, front: str, back: str) -> AIResult:
+    """
+    Truth-checks for a format pass against the text that was sent.
+    """
+    if _actually_changed(res["front"], res["back"], front, back):
+        if not res["changed"]:
+            res["changed"] = True
+        if res["flag"].lower() not in ("format_changed",):
+            res["flag"] = "format_changed"
+        if not res["feedback"].strip():
+            res["feedback"] = "Formatting changed for clarity."
+    else:
+        res["changed"] = False
+        res["flag"] = "format_ok"
+        if not res["feedback"].strip():
+            res["feedback"] = ""
+
+    return res
+
+
+def _combine_both(front: str, back: str, content_res: AIResult, format_res: AIResult) -> AIResult:
+    """
+    Final result of the 2-pass pipeline from the raw content and format results.
+    format_res must have been produced from content_res's front/back.
+    """
     # Determine what content stage did
     content_changed = _actually_changed(content_res["front"], content_res["back"], front, back)
 
-    # Use content output as input to formatting stage
     base_front = content_res["front"]
     base_back = content_res["back"]
 
-    # Pass 2: format
-    format_res = await _call_ai(base_front, base_back, variant, "format")
     format_changed = _actually_changed(format_res["front"], format_res["back"], base_front, base_back)
 
     final_front = format_res["front"]
@@ -290,3 +520,260 @@ async def review_card(front: str, back: str, variant: str = "en-AU", mode: AIMod
     out_feedback = " • ".join(out_feedback_parts) if out_feedback_parts else "Content and formatting changed for clarity."
 
     return AIResult(changed=True, flag="both_changed", feedback=out_feedback, front=final_front, back=final_back)
+
+
+def resolve_fused(fused: bool | None) -> bool:
+    return settings.AI_FUSED_BOTH if fused is None else bool(fused)
+
+
+async def review_card(
+    front: str,
+    back: str,
+    variant: str = "en-AU",
+    mode: AIMode = "content",
+    fused: bool | None = None,
+) -> AIResult:
+    """
+    fused only matters for mode="both": True runs content + format in one call,
+    False the classic 2-pass pipeline, None uses AI_FUSED_BOTH.
+    """
+    if not settings.OPENAI_API_KEY:
+        return AIResult(changed=False, flag="ai_disabled", feedback="AI key not configured", front=front, back=back)
+
+    # -------------------------
+    # CONTENT ONLY
+    # -------------------------
+    if mode == "content":
+        res = await _call_ai(front, back, variant, "content")
+        return _finalise_content(res, front, back)
+
+    # -------------------------
+    # FORMAT ONLY
+    # -------------------------
+    if mode == "format":
+        res = await _call_ai(front, back, variant, "format")
+        return _finalise_format(res, front, back)
+
+    # -------------------------
+    # BOTH (fused) = 1 call returning both stages; same flag rules via _combine_both.
+    # Falls back to the 2-pass pipeline if the structured answer is unusable.
+    # -------------------------
+    if resolve_fused(fused):
+        fused_res = await _call_ai_fused(front, back, variant)
+        if fused_res is not None:
+            content_res, format_res = fused_res
+            if content_res["flag"].lower() == "incorrect":
+                return AIResult(changed=False, flag="incorrect", feedback=content_res["feedback"].strip(), front=front, back=back)
+            return _combine_both(front, back, content_res, format_res)
+
+    # -------------------------
+    # BOTH = 2-pass pipeline:
+    #   1) content (incl incorrect + variant)
+    #   2) format (on output of content)
+    # -------------------------
+    # Pass 1: content
+    content_res = await _call_ai(front, back, variant, "content")
+
+    # If incorrect: STOP, do not format, do not change
+    if content_res["flag"].lower() == "incorrect":
+        return AIResult(changed=False, flag="incorrect", feedback=content_res["feedback"].strip(), front=front, back=back)
+
+    # Pass 2: format (on output of content)
+    format_res = await _call_ai(content_res["front"], content_res["back"], variant, "format")
+
+    return _combine_both(front, back, content_res, format_res)
+
+
+# ---------------------------------------------------------------------
+# Streaming reviews (server-sent events)
+# ---------------------------------------------------------------------
+# (event, data): ("pass", {...}) | ("delta", {...}) | ("result", AIResult)
+ReviewEvent = Tuple[str, dict]
+
+
+async def _stream_pass(name: str, system_prompt: str, user_content: str, out: list) -> AsyncIterator[ReviewEvent]:
+    """
+    One streamed model call: yields "pass" start, the raw text deltas, then "pass" done.
+    The final response JSON is appended to `out` for the caller to parse.
+    """
+    yield "pass", {"pass": name, "status": "start"}
+    async for kind, payload in _stream_responses(system_prompt, user_content):
+        if kind == "delta":
+            yield "delta", {"pass": name, "text": payload}
+        else:
+            out.append(payload)
+    yield "pass", {"pass": name, "status": "done"}
+
+
+async def review_card_stream(
+    front: str,
+    back: str,
+    variant: str = "en-AU",
+    mode: AIMode = "content",
+    fused: bool | None = None,
+) -> AsyncIterator[ReviewEvent]:
+    """
+    Same pipeline and truth-checks as review_card, but streams the provider output:
+    ("pass", {"pass", "status"}) around each model call, ("delta", {"pass", "text"}) for
+    raw output as it arrives, and exactly one final ("result", AIResult).
+    """
+    if not settings.OPENAI_API_KEY:
+        yield "result", AIResult(changed=False, flag="ai_disabled", feedback="AI key not configured", front=front, back=back)
+        return
+
+    if mode in ("content", "format"):
+        data: list = []
+        async for ev in _stream_pass(mode, _system_prompt(mode), _user_content(front, back, variant, mode), data):
+            yield ev
+        res = _parse_single(data[0], front, back)
+        finalise = _finalise_content if mode == "content" else _finalise_format
+        yield "result", finalise(res, front, back)
+        return
+
+    if resolve_fused(fused):
+        data = []
+        async for ev in _stream_pass("both", SYSTEM_PROMPT_BOTH, _user_content(front, back, variant, "both"), data):
+            yield ev
+        fused_res = _parse_fused(data[0], front, back)
+        if fused_res is not None:
+            content_res, format_res = fused_res
+            if content_res["flag"].lower() == "incorrect":
+                yield "result", AIResult(changed=False, flag="incorrect", feedback=content_res["feedback"].strip(), front=front, back=back)
+            else:
+                yield "result", _combine_both(front, back, content_res, format_res)
+            return
+        # unusable fused answer: fall through to the 2-pass pipeline, like review_card
+
+    data = []
+    async for ev in _stream_pass("content", _system_prompt("content"), _user_content(front, back, variant, "content"), data):
+        yield ev
+    content_res = _parse_single(data[0], front, back)
+
+    if content_res["flag"].lower() == "incorrect":
+        yield "result", AIResult(changed=False, flag="incorrect", feedback=content_res["feedback"].strip(), front=front, back=back)
+        return
+
+    data = []
+    cf, cb = content_res["front"], content_res["back"]
+    async for ev in _stream_pass("format", _system_prompt("format"), _user_content(cf, cb, variant, "format"), data):
+        yield ev
+    format_res = _parse_single(data[0], cf, cb)
+
+    yield "result", _combine_both(front, back, content_res, format_res)
+
+
+# ---------------------------------------------------------------------
+# Packed reviews (several cards per request)
+# ---------------------------------------------------------------------
+def _estimate_tokens(text: str) -> int:
+    # ~4 chars per token is close enough for budgeting
+    return len(text) // 4 + 1
+
+
+def pack_cards(
+    cards: Sequence[PackedCard],
+    max_cards: int | None = None,
+    token_budget: int | None = None,
+) -> list[list[PackedCard]]:
+    """
+    Greedily group cards into packs of at most max_cards, keeping each pack's card text
+    under token_budget (a single oversized card still gets its own pack).
+    """
+    max_cards = max(1, max_cards or settings.AI_PACK_SIZE)
+    token_budget = max(1, token_budget or settings.AI_PACK_TOKEN_BUDGET)
+
+    packs: list[list[PackedCard]] = []
+    cur: list[PackedCard] = []
+    cur_tokens = 0
+    for c in cards:
+        t = _estimate_tokens(c[1]) + _estimate_tokens(c[2]) + 16
+        if cur and (len(cur) >= max_cards or cur_tokens + t > token_budget):
+            packs.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(c)
+        cur_tokens += t
+    if cur:
+        packs.append(cur)
+    return packs
+
+
+async def review_cards_packed(
+    cards: Sequence[PackedCard],
+    variant: str = "en-AU",
+    mode: AIMode = "content",
+    fused: bool | None = None,
+    limit: asyncio.Semaphore | None = None,
+) -> dict[int, AIResult]:
+    """
+    Review one pack of cards with a single request per pass.
+    Applies the same per-card truth-checks and incorrect rules as review_card, and falls back
+    to single-card calls for any card whose packed entry is missing or fails to parse.
+
+    Fused 'both' reviews are not packed: each card gets its own single fused call.
+    Every request (packed or single) takes a slot of `limit`, the caller's concurrency
+    bound, for as long as it runs; without one the pack's requests run one at a time.
+    """
+    if not settings.OPENAI_API_KEY:
+        return {
+            cid: AIResult(changed=False, flag="ai_disabled", feedback="AI key not configured", front=f, back=b)
+            for cid, f, b in cards
+        }
+
+    limit = limit or asyncio.Semaphore(1)
+
+    # takes a zero-arg callable, so the coroutine only exists once the slot is held
+    # (cancelled while waiting -> nothing left un-awaited)
+    async def slot(call):
+        async with limit:
+            return await call()
+
+    if mode == "both" and resolve_fused(fused):
+        results = await asyncio.gather(
+            *(slot(partial(review_card, f, b, variant, mode, True)) for _, f, b in cards)
+        )
+        return {cid: r for (cid, _, _), r in zip(cards, results)}
+
+    if len(cards) == 1:
+        cid, f, b = cards[0]
+        return {cid: await slot(partial(review_card, f, b, variant, mode, False))}
+
+    by_id = {cid: (f, b) for cid, f, b in cards}
+    out: dict[int, AIResult] = {}
+
+    async def fallback(cids: list[int], fn) -> None:
+        results = await asyncio.gather(*(slot(partial(fn, cid)) for cid in cids))
+        out.update(zip(cids, results))
+
+    if mode in ("content", "format"):
+        packed = await slot(partial(_call_ai_packed, cards, variant, mode))
+        finalise = _finalise_content if mode == "content" else _finalise_format
+        for cid, res in packed.items():
+            out[cid] = finalise(res, *by_id[cid])
+
+        missing = [cid for cid in by_id if cid not in out]
+        await fallback(missing, lambda cid: review_card(*by_id[cid], variant, mode))
+        return out
+
+    # BOTH: packed content pass, then packed format pass over the content outputs
+    content = await slot(partial(_call_ai_packed, cards, variant, "content"))
+
+    to_format: list[PackedCard] = []
+    for cid, res in content.items():
+        f, b = by_id[cid]
+        if res["flag"].lower() == "incorrect":
+            out[cid] = AIResult(changed=False, flag="incorrect", feedback=res["feedback"].strip(), front=f, back=b)
+        else:
+            to_format.append((cid, res["front"], res["back"]))
+
+    formatted = await slot(partial(_call_ai_packed, to_format, variant, "format")) if to_format else {}
+    for cid, res in formatted.items():
+        out[cid] = _combine_both(*by_id[cid], content[cid], res)
+
+    async def format_single(cid: int) -> AIResult:
+        c = content[cid]
+        return _combine_both(*by_id[cid], c, await _call_ai(c["front"], c["back"], variant, "format"))
+
+    # content entry missing -> whole single-card pipeline; only format entry missing -> single format call
+    await fallback([cid for cid in by_id if cid not in content], lambda cid: review_card(*by_id[cid], variant, "both", False))
+    await fallback([cid for cid, _, _ in to_format if cid not in formatted], format_single)
+    return out
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import html
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Must match the GIN index expression in migrations/versions/0004_card_search.py,
+# or Postgres can't use the index.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(c.front, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(c.back, '')), 'B')"
+)
+
+# Match markers put in by the database; swapped for <mark> after the text is HTML-escaped
+_START, _STOP = "\x02", "\x03"
+
+# words only: user input never reaches the FTS5 / tsquery syntax as-is
+_TERM_RE = re.compile(r"[^\W_]+")
+MAX_TERMS = 16
+
+# back is usually the long side: show a window of it around the matches
+SNIPPET_WORDS = 32
+
+_SQLITE_SEARCH = """
+SELECT c.id, c.project_id, p.name AS project_name, c.card_type,
+       highlight(cards_fts, 0, char(2), char(3)) AS front,
+       snippet(cards_fts, 1, char(2), char(3), '…', {snippet}) AS back,
+       -cards_fts.rank AS score
+FROM cards_fts
+JOIN cards c ON c.id = cards_fts.rowid
+JOIN projects p ON p.id = c.project_id
+WHERE cards_fts MATCH :query AND p.owner_id = :owner_id {project_filter}
+ORDER BY cards_fts.rank
+LIMIT :limit OFFSET :offset
+"""
+
+# Rank and page first, then build headlines (the expensive part) for that page only
+_PG_SEARCH = """
+WITH q AS (SELECT to_tsquery('english', :query) AS q),
+hits AS (
+    SELECT c.id, ts_rank({vector}, q.q) AS score
+    FROM cards c JOIN projects p ON p.id = c.project_id, q
+    WHERE {vector} @@ q.q AND p.owner_id = :owner_id {project_filter}
+    ORDER BY score DESC, c.id
+    LIMIT :limit OFFSET :offset
+)
+SELECT c.id, c.project_id, p.name AS project_name, c.card_type,
+       ts_headline('english', coalesce(c.front, ''), q.q, :front_opts) AS front,
+       ts_headline('english', coalesce(c.back, ''), q.q, :back_opts) AS back,
+       hits.score
+FROM hits JOIN cards c ON c.id = hits.id JOIN projects p ON p.id = c.project_id, q
+ORDER BY hits.score DESC, c.id
+"""
+
+
+def search_terms(q: str) -> list[str]:
+    return _TERM_RE.findall(q.lower())[:MAX_TERMS]
+
+
+def _marked(s: str | None) -> str:
+    return html.escape(s or "").replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def search_cards(
+    db: Session,
+    owner_id: int,
+    q: str,
+    project_id: int | None = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> tuple[list[dict], int | None]:
+    """
+    Full-text search over the front/back of a user's cards (optionally one project's):
+    one page of hits, best first, plus the offset of the next page (None at the end).
+
+    Every word must match; the last one also matches as a prefix, for search-as-you-type.
+    Words are stemmed (english / porter), so "cells" finds "cell"; front matches rank above back.
+    front comes back highlighted in full and back as a snippet around the matches, both
+    HTML-escaped with the matches wrapped in <mark>...</mark>.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return [], None
+
+    params = {"owner_id": owner_id, "limit": limit + 1, "offset": offset}
+    project_filter = ""
+    if project_id is not None:
+        project_filter = "AND c.project_id = :project_id"
+        params["project_id"] = project_id
+
+    if db.get_bind().dialect.name == "postgresql":
+        params["query"] = " & ".join(terms[:-1] + [terms[-1] + ":*"])
+        params["front_opts"] = f"HighlightAll=true, StartSel={_START}, StopSel={_STOP}"
+        params["back_opts"] = (
+            f"MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}, MaxFragments=2, "
+            f"FragmentDelimiter=\" … \", StartSel={_START}, StopSel={_STOP}"
+        )
+        sql = _PG_SEARCH.format(vector=SEARCH_VECTOR, project_filter=project_filter)
+    else:
+        params["query"] = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+        sql = _SQLITE_SEARCH.format(snippet=SNIPPET_WORDS, project_filter=project_filter)
+
+    rows = db.execute(text(sql), params).all()
+    more = len(rows) > limit
+    hits = [
+        {
+            "id": r.id,
+            "project_id": r.project_id,
+            "project_name": r.project_name,
+            "card_type": r.card_type,
+            "front": _marked(r.front),
+            "back": _marked(r.back),
+            "score": round(float(r.score), 6),
+        }
+        for r in rows[:limit]
+    ]
+    return hits, (offset + limit if more else None)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Sequence
+
+from sqlalchemy import delete, insert, literal, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, load_only
+
+from ..config import settings
+from ..models import Card, CardTombstone, Project
+from ..parser_md import ParsedCard, card_fingerprint
+from .usage_counters import cards_added, cards_removed
+
+# (card_type, front, back, raw), as returned by parser_md.parse_page
+CardRow = tuple
+
+# Columns handed back by insert_returning (what the card routes serialise)
+RETURNED = (Card.id, Card.project_id, Card.card_type, Card.front, Card.back, Card.raw)
+
+# Everything the card listings can return, in response order
+CARD_FIELDS = (
+    "id",
+    "project_id",
+    "card_type",
+    "front",
+    "back",
+    "raw",
+    "ai_changed",
+    "ai_flag",
+    "ai_feedback",
+    "ai_suggest_front",
+    "ai_suggest_back",
+    "revision",
+    "updated_at",
+)
+
+# Reset when a card's text changes by hand or by re-import (the old review no longer applies)
+CLEARED_AI = {
+    "ai_changed": False,
+    "ai_flag": None,
+    "ai_feedback": None,
+    "ai_suggest_front": None,
+    "ai_suggest_back": None,
+    "ai_review_hash": None,
+}
+
+
+def bump_revision(db: Session, project_id: int) -> int:
+    """
+    Increment a project's revision after changing its cards; returns the new revision.
+    Atomic (revision = revision + 1 in SQL). Does NOT commit: call it in the same
+    transaction as the card write.
+    """
+    return db.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(revision=Project.revision + 1)
+        .returning(Project.revision)
+    ).scalar_one()
+
+
+def bump_revisions_for_cards(db: Session, card_ids: Sequence[int]) -> None:
+    """
+    bump_revision for every project owning one of card_ids (AI write-back only knows card ids),
+    then stamp those cards with their project's new revision.
+    """
+    if not card_ids:
+        return
+    ids = list(card_ids)
+    owners = select(Card.project_id).where(Card.id.in_(ids)).distinct()
+    db.execute(
+        update(Project)
+        .where(Project.id.in_(owners))
+        .values(revision=Project.revision + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Card)
+        .where(Card.id.in_(ids))
+        .values(revision=select(Project.revision).where(Project.id == Card.project_id).scalar_subquery())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_cards(db: Session, project_id: int, revision: int, card_ids: Sequence[int]) -> None:
+    """
+    Delete some of a project's cards, leaving tombstones at `revision` for delta sync.
+    Does NOT commit.
+    """
+    created = []
+    batch_size = max(1, settings.IMPORT_BATCH_SIZE)
+    for i in range(0, len(card_ids), batch_size):
+        chunk = list(card_ids[i:i + batch_size])
+        db.execute(
+            insert(CardTombstone).from_select(
+                ["project_id", "card_id", "revision"],
+                select(Card.project_id, Card.id, literal(revision))
+                .where(Card.project_id == project_id, Card.id.in_(chunk)),
+            )
+        )
+        created.extend(
+            db.execute(
+                delete(Card)
+                .where(Card.project_id == project_id, Card.id.in_(chunk))
+                .returning(Card.created_at)
+                .execution_options(synchronize_session=False)
+            ).scalars()
+        )
+    cards_removed(db, project_id, created)
+
+
+def reset_cards(db: Session, project_id: int, revision: int) -> None:
+    """
+    Delete all of a project's cards (replace-style saves and imports).
+    Rather than a tombstone per card, the project's reset_revision moves to `revision`:
+    delta-sync clients behind it get a full snapshot, and older tombstones are dropped.
+    Does NOT commit.
+    """
+    created = db.execute(
+        delete(Card)
+        .where(Card.project_id == project_id)
+        .returning(Card.created_at)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    cards_removed(db, project_id, created)
+    db.execute(delete(CardTombstone).where(CardTombstone.project_id == project_id))
+    db.execute(update(Project).where(Project.id == project_id).values(reset_revision=revision))
+
+
+def deleted_since(db: Session, project_id: int, since: int) -> list[int]:
+    """
+    Ids of cards deleted after revision `since` (and not since re-created under the same id
+    in the same project), in deletion order; read straight off the (project_id, revision) index.
+    SQLite reuses the rowid of the highest card, so an id re-used by another project's card
+    must not hide the tombstone.
+    """
+    rows = db.execute(
+        select(CardTombstone.card_id)
+        .where(CardTombstone.project_id == project_id, CardTombstone.revision > since)
+        .where(
+            ~select(Card.id)
+            .where(Card.id == CardTombstone.card_id, Card.project_id == CardTombstone.project_id)
+            .exists()
+        )
+        .order_by(CardTombstone.revision)
+    ).scalars()
+    return list(rows)
+
+
+def card_row(project_id: int, c: ParsedCard | CardRow, revision: int) -> dict:
+    """
+    Column values for a new card written at project `revision`, including its source fingerprint.
+    """
+    card_type, front, back, raw = (c.card_type, c.front, c.back, c.raw) if isinstance(c, ParsedCard) else c
+    return {
+        "project_id": project_id,
+        "card_type": card_type,
+        "front": front,
+        "back": back,
+        "raw": raw,
+        "source_fingerprint": card_fingerprint(card_type, front, back),
+        "revision": revision,
+    }
+
+
+def insert_returning(db: Session, rows: Sequence[dict], chunk_size: int | None = None) -> list[Row]:
+    """
+    Multi-row INSERT ... RETURNING in chunks: one round trip per chunk instead of
+    an INSERT plus a refresh SELECT per card. Rows come back in input order.
+    Does NOT commit.
+    """
+    chunk_size = max(1, chunk_size or settings.IMPORT_BATCH_SIZE)
+
+    # Postgres can guarantee RETURNING order for a batched insert. SQLite can't, and asking
+    # for it falls back to one INSERT per row; but a single INSERT there hands out rowids
+    # in VALUES order, so sorting each chunk by id restores input order.
+    postgres = db.get_bind().dialect.name == "postgresql"
+    stmt = insert(Card).returning(*RETURNED, sort_by_parameter_order=postgres)
+
+    out: list[Row] = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = db.execute(stmt, list(rows[i:i + chunk_size])).all()
+        out.extend(chunk if postgres else sorted(chunk, key=lambda r: r.id))
+    for project_id, n in Counter(r["project_id"] for r in rows).items():
+        cards_added(db, project_id, n)
+    return out
+
+
+def parse_fields(fields: str | None) -> tuple[str, ...]:
+    """
+    "front,back,ai_flag" -> the requested CARD_FIELDS (id is always included).
+    None / empty means all of them. Raises ValueError on unknown names.
+    """
+    if not fields:
+        return CARD_FIELDS
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - set(CARD_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in CARD_FIELDS if f in wanted or f == "id")
+
+
+def list_cards_page(
+    db: Session,
+    project_id: int,
+    fields: tuple[str, ...] = CARD_FIELDS,
+    limit: int | None = None,
+    after: int | None = None,
+    since: int | None = None,
+) -> tuple[list[dict], int | None]:
+    """
+    One page of a project's cards in id order, plus the cursor for the next page (None at the end).
+
+    Keyset pagination on (project_id, id): `after` is the last id of the previous page, so every
+    page is an index range scan however deep the client has scrolled. Columns outside `fields`
+    are never loaded (load_only), which keeps the big Text columns out of light listings.
+    limit=None returns everything (the original unpaginated behaviour).
+    since: only cards written after that project revision (delta sync).
+    """
+    q = (
+        db.query(Card)
+        .options(load_only(*(getattr(Card, f) for f in fields)))
+        .filter(Card.project_id == project_id)
+    )
+    if after is not None:
+        q = q.filter(Card.id > after)
+    if since is not None:
+        q = q.filter(Card.revision > since)
+    q = q.order_by(Card.id.asc())
+
+    if limit is None:
+        rows, more = q.all(), False
+    else:
+        rows = q.limit(limit + 1).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+
+    cards = [{f: getattr(c, f) for f in fields} for c in rows]
+    return cards, (rows[-1].id if more else None)
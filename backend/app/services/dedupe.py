@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Iterable, Protocol, Sequence
+
+# Near-duplicate cards (the same question copied across Notion pages, give or take
+# formatting and typos), found without comparing every pair:
+#
+# 1. each card becomes a set of character 5-grams of its normalised front + back
+# 2. a 64-value MinHash signature per set (one-permutation hashing: every shingle is hashed
+#    once and lands in one of 64 bins, empty bins borrow from their neighbour)
+# 3. LSH: signatures cut into 16 bands of 4; cards sharing a band land in one bucket and
+#    become candidates (pairs with Jaccard 0.8 collide with probability > 0.999)
+# 4. candidates are checked with the exact Jaccard similarity and joined with union-find
+#
+# A bucket keeps its cards grouped by the cluster they have joined so far. A new card is
+# checked against each other cluster in the bucket, member by member until one is similar
+# enough; a cluster it has already joined is skipped. A card that matches one member of a
+# cluster but not the first one is still found, and a bucket full of copies of one card
+# costs one comparison per new card.
+
+SHINGLE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+_BIN_BITS = NUM_PERM.bit_length() - 1
+_BIN_MASK = NUM_PERM - 1
+# densification: a borrowed value is shifted per bin of distance so it isn't an exact copy
+_BORROW_STEP = 0x9E3779B97F4A7C15
+
+
+class CardText(Protocol):
+    id: int
+    front: str | None
+    back: str | None
+
+
+def normalise(text: str | None) -> str:
+    """
+    Text for comparison: case, Unicode forms, punctuation / markdown and spacing don't count.
+    """
+    t = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join(_NON_WORD_RE.sub(" ", t).split())
+
+
+def shingles(front: str | None, back: str | None) -> frozenset[int]:
+    """
+    Hashed character shingles of a card; empty for a card with no text.
+    """
+    f, b = normalise(front), normalise(back)
+    if not f and not b:
+        return frozenset()
+    # "|" never survives normalise(), so nothing straddles front and back unnoticed
+    s = f"{f} | {b}"
+    # the built-in str hash (SipHash, in C) is by far the cheapest per shingle; its per-process
+    # salt doesn't matter, signatures are compared within one call and never stored
+    if len(s) <= SHINGLE:
+        return frozenset((hash(s),))
+    n = len(s) - SHINGLE + 1
+    return frozenset(map(hash, map(s.__getitem__, map(slice, range(n), range(SHINGLE, n + SHINGLE)))))
+
+
+def signature(sh: frozenset[int]) -> tuple[int, ...]:
+    # bin = low bits, value = the rest; in descending order the last write per bin is its minimum
+    bins = {h & _BIN_MASK: h >> _BIN_BITS for h in sorted(sh, reverse=True)}
+    if len(bins) == NUM_PERM:
+        return tuple(bins[i] for i in range(NUM_PERM))
+
+    out = []
+    for i in range(NUM_PERM):
+        d = 0
+        while (i + d) % NUM_PERM not in bins:
+            d += 1
+        out.append(bins[(i + d) % NUM_PERM] + d * _BORROW_STEP)
+    return tuple(out)
+
+
+def jaccard(a: frozenset[int], b: frozenset[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def find_clusters(cards: Sequence[CardText], threshold: float) -> list[list[tuple[int, float]]]:
+    """
+    Groups of near-duplicate cards (Jaccard similarity of their shingles >= threshold).
+
+    Each group is [(kept id, 1.0), (id, similarity to the kept card), ...]: the kept card
+    is the oldest (lowest id), the rest follow in id order. Through chains (A~B, B~C) a
+    member can end up below threshold against the kept card; its score says so.
+    Cards with no text are never duplicates. Groups come in order of their kept card.
+    """
+    items = sorted(
+        ((c.id, sh) for c in cards if (sh := shingles(c.front, c.back))),
+        key=lambda t: t[0],
+    )
+    parent = list(range(len(items)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def regroup(clusters: dict[int, list[int]]) -> None:
+        # clusters merged since the bucket was last seen are filed under their new root
+        for r in [r for r in clusters if find(r) != r]:
+            members, root = clusters.pop(r), find(r)
+            into = clusters.setdefault(root, members)
+            if into is not members:
+                if len(into) < len(members):
+                    into, members = members, into
+                    clusters[root] = into
+                into.extend(members)
+
+    # band key -> {cluster root: cards of that cluster in the bucket}
+    buckets: dict[tuple, dict[int, list[int]]] = {}
+    checked: set[tuple[int, int]] = set()
+    for i, (_, sh) in enumerate(items):
+        sig = signature(sh)
+        keys = [(band, *sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+        for key in keys:
+            clusters = buckets.get(key)
+            if not clusters:
+                continue
+            regroup(clusters)
+            for root, members in clusters.items():
+                if root == find(i):
+                    continue
+                for m in members:
+                    if (m, i) in checked:
+                        continue
+                    checked.add((m, i))
+                    if jaccard(items[m][1], sh) >= threshold:
+                        parent[find(i)] = root
+                        break
+        for key in keys:
+            buckets.setdefault(key, {}).setdefault(find(i), []).append(i)
+
+    groups: dict[int, list[int]] = {}
+    for i in range(len(items)):
+        groups.setdefault(find(i), []).append(i)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        keep_id, keep_sh = items[members[0]]
+        clusters.append(
+            [(keep_id, 1.0)] + [(items[m][0], round(jaccard(keep_sh, items[m][1]), 3)) for m in members[1:]]
+        )
+    clusters.sort(key=lambda c: c[0][0])
+    return clusters
+
+
+def duplicate_of(cards: Iterable[CardText], threshold: float) -> dict[int, int]:
+    """
+    card id -> id of the card it duplicates, for every card but the kept one of each group;
+    what skip_duplicates leaves out of reviews and exports.
+    """
+    out: dict[int, int] = {}
+    for cluster in find_clusters(list(cards), threshold):
+        keep_id = cluster[0][0]
+        for card_id, _ in cluster[1:]:
+            out[card_id] = keep_id
+    return out
@@ -1,7 +1,10 @@
 from __future__ import annotations
 from datetime import datetime
+from sqlalchemy import case, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from ..models import User
+from .usage_counters import ai_reviews_added
 
 PLAN_LIMITS = {"free": 0, "silver": 2000, "gold": 6000, "platinum": 12000}
 
@@ -12,10 +15,15 @@ def current_month_key() -> str:
 def ensure_month(db: Session, user: User):
     mk = current_month_key()
     if user.usage_month != mk:
-        user.usage_month = mk
-        user.usage_count = 0
-        db.add(user)
+        # conditional, so a reset can't wipe reviews another request already charged this month
+        db.execute(
+            update(User)
+            .where(User.id == user.id, User.usage_month.is_distinct_from(mk))
+            .values(usage_month=mk, usage_count=0)
+            .execution_options(synchronize_session=False)
+        )
         db.commit()
+        db.refresh(user)
 
 def can_use_ai(db: Session, user: User):
     ensure_month(db, user)
@@ -23,8 +31,22 @@ def can_use_ai(db: Session, user: User):
     used = user.usage_count
     return (used < limit, used, limit)
 
-def consume_ai(db: Session, user: User, amount: int = 1):
-    ensure_month(db, user)
-    user.usage_count += amount
-    db.add(user)
-    db.commit()
+def consume_ai(db: Session, user: User, amount: int = 1, commit: bool = True):
+    # one UPDATE (month rollover included), so concurrent charges can't overwrite each other;
+    # commit=False leaves the charge in the caller's transaction, next to the result it pays for
+    mk = current_month_key()
+    used = db.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(
+            usage_month=mk,
+            usage_count=case((User.usage_month == mk, User.usage_count + amount), else_=amount),
+        )
+        .returning(User.usage_count)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+    ai_reviews_added(db, user.id, amount)
+    if commit:
+        db.commit()
+    set_committed_value(user, "usage_month", mk)
+    set_committed_value(user, "usage_count", used)
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+import zlib
+from collections import deque
+from difflib import SequenceMatcher
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import BinaryIO, Iterable, Iterator
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Card
+from ..parser_md import ParsedCard, card_fingerprint, parse_page
+from .cards_store import CLEARED_AI, CardRow, card_row, delete_cards
+from .usage_counters import cards_added
+
+# ---------------------------------------------------------------------
+# Inserting
+# ---------------------------------------------------------------------
+def insert_cards(db: Session, project_id: int, cards: Iterable[ParsedCard | CardRow], revision: int) -> int:
+    """
+    Insert parsed cards (at project `revision`) in executemany batches of IMPORT_BATCH_SIZE as they arrive.
+    Does NOT commit. Returns the number of cards inserted.
+    """
+    batch_size = max(1, settings.IMPORT_BATCH_SIZE)
+    batch: list[dict] = []
+    n = 0
+    for c in cards:
+        batch.append(card_row(project_id, c, revision))
+        if len(batch) >= batch_size:
+            db.execute(insert(Card), batch)
+            n += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(Card), batch)
+        n += len(batch)
+    cards_added(db, project_id, n)
+    return n
+
+
+def sync_cards(
+    db: Session, project_id: int, cards: Iterable[ParsedCard | CardRow], revision: int
+) -> dict[str, int]:
+    """
+    Re-import: make the project's cards match `cards` while touching as few rows as possible.
+
+    Existing cards (in id order) and the new cards are diffed on their source fingerprints:
+    - equal runs keep their rows untouched: same ids, AI results and any applied/manual edits
+    - replaced runs are updated in place pairwise (the id survives, the stale AI review is cleared)
+    - the rest are inserted / deleted (leaving tombstones)
+    Written rows are stamped with project `revision`, for delta sync.
+
+    Cards are listed by id, so inserted cards come after the existing ones rather than at
+    their position in the document. Does NOT commit. Returns counts per outcome.
+    """
+    new_rows = [card_row(project_id, c, revision) for c in cards]
+
+    old = db.execute(
+        select(Card.id, Card.source_fingerprint, Card.card_type, Card.front, Card.back)
+        .where(Card.project_id == project_id)
+        .order_by(Card.id.asc())
+    ).all()
+    # cards saved before fingerprints existed: fall back to their current text
+    old_ids = [r.id for r in old]
+    old_fps = [r.source_fingerprint or card_fingerprint(r.card_type, r.front, r.back) for r in old]
+    new_fps = [r["source_fingerprint"] for r in new_rows]
+
+    counts = {"unchanged": 0, "updated": 0, "inserted": 0, "deleted": 0}
+    updates: list[dict] = []
+    inserts: list[dict] = []
+    deletes: list[int] = []
+
+    for op, i1, i2, j1, j2 in SequenceMatcher(None, old_fps, new_fps, autojunk=False).get_opcodes():
+        if op == "equal":
+            counts["unchanged"] += i2 - i1
+            continue
+        paired = min(i2 - i1, j2 - j1) if op == "replace" else 0
+        for k in range(paired):
+            r = new_rows[j1 + k]
+            updates.append({
+                "id": old_ids[i1 + k],
+                **{f: r[f] for f in ("card_type", "front", "back", "raw", "source_fingerprint", "revision")},
+                **CLEARED_AI,
+            })
+        deletes.extend(old_ids[i1 + paired:i2])
+        inserts.extend(new_rows[j1 + paired:j2])
+
+    delete_cards(db, project_id, revision, deletes)
+    batch_size = max(1, settings.IMPORT_BATCH_SIZE)
+    for i in range(0, len(updates), batch_size):
+        db.execute(update(Card), updates[i:i + batch_size])
+    for i in range(0, len(inserts), batch_size):
+        db.execute(insert(Card), inserts[i:i + batch_size])
+    cards_added(db, project_id, len(inserts))
+
+    counts["updated"] = len(updates)
+    counts["inserted"] = len(inserts)
+    counts["deleted"] = len(deletes)
+    return counts
+
+
+# ---------------------------------------------------------------------
+# Zipped Notion exports
+# ---------------------------------------------------------------------
+class ZipImportError(ValueError):
+    pass
+
+
+# Notion appends a 32-hex page id to every exported file/folder name: "Biology 1a2b...9f.md"
+_NOTION_ID_RE = re.compile(r"\s+[0-9a-f]{32}$", re.I)
+_DIGITS_RE = re.compile(r"(\d+)")
+
+
+def export_title(filename: str) -> str:
+    name = filename.rsplit("/", 1)[-1]
+    if name.lower().endswith(".zip"):
+        name = name[:-4]
+    return _NOTION_ID_RE.sub("", name).strip() or "Imported"
+
+
+def page_title(path: str) -> str:
+    name = path.rsplit("/", 1)[-1]
+    if name.lower().endswith(".md"):
+        name = name[:-3]
+    return _NOTION_ID_RE.sub("", name).strip() or "Untitled"
+
+
+def _natural_key(path: str) -> list:
+    # "Week 2" before "Week 10"; compare directory by directory, ignoring Notion ids and case
+    key = []
+    for part in path.split("/"):
+        part = _NOTION_ID_RE.sub("", part[:-3] if part.lower().endswith(".md") else part).casefold()
+        key.append([int(t) if t.isdigit() else t for t in _DIGITS_RE.split(part)])
+    return key
+
+
+def md_members(zf: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    """
+    The .md pages of an export in a deterministic (natural, path-wise) order.
+    Enforces IMPORT_ZIP_MAX_PAGES and IMPORT_ZIP_MAX_BYTES (uncompressed) before anything is read.
+    """
+    members = [
+        i for i in zf.infolist()
+        if not i.is_dir()
+        and i.filename.lower().endswith(".md")
+        and not i.filename.startswith("__MACOSX/")
+        and not i.filename.rsplit("/", 1)[-1].startswith("._")
+    ]
+    if len(members) > settings.IMPORT_ZIP_MAX_PAGES:
+        raise ZipImportError(f"Too many pages ({len(members)} > {settings.IMPORT_ZIP_MAX_PAGES})")
+    if sum(i.file_size for i in members) > settings.IMPORT_ZIP_MAX_BYTES:
+        raise ZipImportError("Export too large once unzipped")
+
+    members.sort(key=lambda i: _natural_key(i.filename))
+    return members
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _workers() -> int:
+    return settings.IMPORT_WORKERS or os.cpu_count() or 1
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process runs threads (thread pool, DB pool) that must not be forked
+            _pool = ProcessPoolExecutor(max_workers=_workers(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _read_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    # a damaged, encrypted or oddly compressed member is a bad upload (400), not a server error
+    try:
+        return zf.read(info)
+    except (zipfile.BadZipFile, zlib.error, RuntimeError, NotImplementedError, EOFError) as e:
+        raise ZipImportError(f"Can't read {info.filename}: {e}") from e
+
+
+def parse_zip(file: BinaryIO) -> Iterator[tuple[str, list[CardRow]]]:
+    """
+    Yield (page title, cards) for every .md page of a zipped export, in page order.
+
+    Members are read straight from the (spooled) upload, never extracted to disk.
+    Pages are parsed in the process pool with a bounded window of in-flight pages,
+    so memory holds a few pages at a time rather than the whole export.
+    Small exports are parsed inline; starting workers would cost more than it saves.
+    """
+    try:
+        zf = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ZipImportError("Not a zip file")
+
+    with zf:
+        members = md_members(zf)
+
+        if len(members) < settings.IMPORT_POOL_MIN_PAGES or _workers() == 1:
+            for info in members:
+                yield page_title(info.filename), parse_page(_read_member(zf, info))
+            return
+
+        pool = get_pool()
+        window: deque[tuple[zipfile.ZipInfo, Future]] = deque()
+        try:
+            for info in members:
+                window.append((info, pool.submit(parse_page, _read_member(zf, info))))
+                if len(window) >= 2 * _workers():
+                    done, fut = window.popleft()
+                    yield page_title(done.filename), fut.result()
+            while window:
+                done, fut = window.popleft()
+                yield page_title(done.filename), fut.result()
+        finally:
+            for _, fut in window:
+                fut.cancel()
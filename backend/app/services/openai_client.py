@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import httpx
+
+from ..config import settings
+
+# One pooled client per process: keep-alive + HTTP/2 so each card doesn't pay
+# for its own TCP/TLS handshake (and we don't burn ephemeral ports under load).
+_client: httpx.AsyncClient | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=settings.OPENAI_HTTP2,
+        timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+async def open_client() -> httpx.AsyncClient:
+    """
+    Called from the FastAPI lifespan on startup.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_client() -> None:
+    """
+    Called from the FastAPI lifespan on shutdown.
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    The shared client. Created lazily so scripts/workers that don't run the
+    FastAPI lifespan still get a pooled client.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
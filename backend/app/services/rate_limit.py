@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import random
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from ..config import settings
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at `per_minute / 60` per second.
+    The balance may go negative when a request turns out to cost more than estimated.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, float(per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n: float) -> float:
+        self._refill()
+        n = min(n, self.capacity)
+        if self.tokens >= n:
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    def take(self, n: float) -> None:
+        self._refill()
+        self.tokens -= n
+
+    def adjust(self, delta: float) -> None:
+        """
+        Positive delta refunds, negative charges more (e.g. actual vs estimated tokens).
+        """
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class AdaptiveLimiter:
+    """
+    Client-side limiter for the OpenAI API:
+    - requests/minute and tokens/minute token buckets
+    - AIMD concurrency: halve on 429, grow by ~1 per `limit` successes, within [min, max]
+    - a shared pause after a 429 so every caller backs off, not just the one that got it
+    """
+
+    def __init__(self, rpm: int, tpm: int, min_concurrency: int, max_concurrency: int):
+        self.rpm = TokenBucket(rpm)
+        self.tpm = TokenBucket(tpm)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._cond: asyncio.Condition | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _condition(self) -> asyncio.Condition:
+        # asyncio primitives are tied to the loop that first uses them
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+        return self._cond
+
+    async def _acquire(self, tokens: int) -> None:
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+        try:
+            while True:
+                wait = max(
+                    self.paused_until - time.monotonic(),
+                    self.rpm.wait_time(1),
+                    self.tpm.wait_time(tokens),
+                )
+                if wait <= 0:
+                    self.rpm.take(1)
+                    self.tpm.take(tokens)
+                    return
+                await asyncio.sleep(wait)
+        except BaseException:
+            await self._release()
+            raise
+
+    async def _release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int):
+        await self._acquire(tokens)
+        try:
+            yield
+        finally:
+            await self._release()
+
+    def on_success(self, estimated_tokens: int, actual_tokens: int | None) -> None:
+        if actual_tokens is not None:
+            self.tpm.adjust(estimated_tokens - actual_tokens)
+        self.limit = min(float(self.max_concurrency), self.limit + 1.0 / max(self.limit, 1.0))
+
+    def on_throttle(self, retry_after: float | None) -> None:
+        self.throttled += 1
+        self.limit = max(float(self.min_concurrency), self.limit / 2)
+        if retry_after:
+            # a huge Retry-After must not stall every caller: pause at most OPENAI_BACKOFF_MAX
+            pause = min(retry_after, settings.OPENAI_BACKOFF_MAX)
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "throttled": self.throttled,
+        }
+
+
+_limiter: AdaptiveLimiter | None = None
+
+
+def get_limiter() -> AdaptiveLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = AdaptiveLimiter(
+            rpm=settings.OPENAI_RPM,
+            tpm=settings.OPENAI_TPM,
+            min_concurrency=settings.OPENAI_MIN_CONCURRENCY,
+            max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+        )
+    return _limiter
+
+
+def retry_after_seconds(r: httpx.Response) -> float | None:
+    """
+    Honour Retry-After (seconds or HTTP date) and OpenAI's retry-after-ms, capped at
+    OPENAI_BACKOFF_MAX: a request (and the slot / session it holds) never waits longer.
+    """
+    wait = _retry_after(r)
+    return None if wait is None else min(wait, settings.OPENAI_BACKOFF_MAX)
+
+
+def _retry_after(r: httpx.Response) -> float | None:
+    ms = r.headers.get("retry-after-ms")
+    if ms:
+        try:
+            return max(0.0, float(ms) / 1000.0)
+        except ValueError:
+            pass
+
+    ra = r.headers.get("retry-after")
+    if not ra:
+        return None
+    try:
+        return max(0.0, float(ra))
+    except ValueError:
+        pass
+    try:
+        dt = email.utils.parsedate_to_datetime(ra)
+        return max(0.0, dt.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt: int) -> float:
+    """
+    Full-jitter exponential backoff: uniform(0, min(max, base * 2^attempt)).
+    """
+    cap = min(settings.OPENAI_BACKOFF_MAX, settings.OPENAI_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def is_retryable_status(code: int) -> bool:
+    return code == 429 or code >= 500
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import AIReviewCache
+from .ai_review import AIMode, AIResult, PROMPT_VERSION, _norm_variant
+
+# Results that say nothing about the card itself (config / transport problems) are never cached.
+UNCACHEABLE_FLAGS = ("parse_error", "ai_disabled")
+
+# prune() takes this transaction-level advisory lock on Postgres, so concurrent workers skip
+# instead of deleting the same oldest rows
+_PRUNE_LOCK_ID = 0x4E32415F43414348
+
+# key -> (expires at, result); an entry lives no longer than its row would (AI_CACHE_TTL_DAYS)
+_lru: OrderedDict[str, tuple[datetime, AIResult]] = OrderedDict()
+_lock = threading.Lock()
+# Session.info slot for results written in the open transaction, waiting to enter the LRU
+_PENDING = "review_cache_pending"
+
+
+def cache_key(front: str, back: str, variant: str, mode: AIMode, fused: bool = False) -> str:
+    """
+    Content address of a review: identical text reviewed the same way with the same
+    model and prompts gives the same key, whichever card/project it lives on.
+    Fused and 2-pass 'both' reviews are kept apart so they can be compared.
+    """
+    pipeline = "both+fused" if mode == "both" and fused else mode
+    parts = [front or "", back or "", _norm_variant(variant), pipeline, settings.OPENAI_MODEL, PROMPT_VERSION]
+    # length-prefix each part so ("ab", "c") and ("a", "bc") can't collide
+    s = "".join(f"{len(p)}:{p}" for p in parts)
+    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(result: AIResult) -> bool:
+    return (result.get("flag") or "").strip().lower() not in UNCACHEABLE_FLAGS
+
+
+def _lru_get(key: str) -> AIResult | None:
+    with _lock:
+        hit = _lru.get(key)
+        if hit is None:
+            return None
+        expires, result = hit
+        if expires <= datetime.now(timezone.utc):
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return result
+
+
+def _lru_put(key: str, result: AIResult, created_at: datetime | None = None) -> None:
+    created_at = created_at or datetime.now(timezone.utc)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    with _lock:
+        _lru[key] = (created_at + timedelta(days=settings.AI_CACHE_TTL_DAYS), result)
+        _lru.move_to_end(key)
+        while len(_lru) > settings.AI_CACHE_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=settings.AI_CACHE_TTL_DAYS)
+
+
+def get_many(db: Session, keys: Iterable[str]) -> dict[str, AIResult]:
+    """
+    Look up many keys: in-process LRU first, then one query for the rest.
+    """
+    found: dict[str, AIResult] = {}
+    missing: list[str] = []
+    for k in dict.fromkeys(keys):
+        hit = _lru_get(k)
+        if hit is not None:
+            found[k] = hit
+        else:
+            missing.append(k)
+
+    # keep IN (...) lists reasonably sized
+    for i in range(0, len(missing), 500):
+        chunk = missing[i:i + 500]
+        rows = db.execute(
+            select(AIReviewCache.key, AIReviewCache.result, AIReviewCache.created_at)
+            .where(AIReviewCache.key.in_(chunk))
+            .where(AIReviewCache.created_at >= _cutoff())
+        ).all()
+        for key, raw, created_at in rows:
+            try:
+                res = AIResult(**json.loads(raw))
+            except Exception:
+                continue
+            found[key] = res
+            _lru_put(key, res, created_at)
+
+    return found
+
+
+def get(db: Session, key: str) -> AIResult | None:
+    return get_many(db, [key]).get(key)
+
+
+def _upsert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(AIReviewCache)
+
+
+def put_many(db: Session, items: dict[str, AIResult]) -> None:
+    """
+    Store results in both tiers. Does NOT commit: callers write the cache
+    in the same transaction as the card results. The LRU only takes them once
+    that transaction commits, so a rollback can't leave results behind in memory.
+    Expired / excess rows are pruned separately (prune(), run by the job worker).
+    """
+    rows = [{"key": k, "result": json.dumps(r)} for k, r in items.items() if is_cacheable(r)]
+    if not rows:
+        return
+
+    db.info.setdefault(_PENDING, {}).update((r["key"], items[r["key"]]) for r in rows)
+
+    # Upsert: two workers may review the same text concurrently, and an expired row gets refreshed.
+    stmt = _upsert(db)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AIReviewCache.key],
+        set_={"result": stmt.excluded.result, "created_at": func.now()},
+    )
+    db.execute(stmt, rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _fill_lru(db: Session) -> None:
+    for key, result in db.info.pop(_PENDING, {}).items():
+        _lru_put(key, result)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(db: Session) -> None:
+    db.info.pop(_PENDING, None)
+
+
+def put(db: Session, key: str, result: AIResult) -> None:
+    put_many(db, {key: result})
+
+
+def prune(db: Session) -> None:
+    """
+    TTL eviction, then trim the table to AI_CACHE_MAX_ROWS (oldest first), in a transaction
+    of its own: it commits, so call it on a session with nothing else pending.
+    Kept off the review write path; the job worker runs it every AI_CACHE_PRUNE_SECONDS.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        if not db.execute(select(func.pg_try_advisory_xact_lock(_PRUNE_LOCK_ID))).scalar_one():
+            db.rollback()
+            return
+
+    db.execute(delete(AIReviewCache).where(AIReviewCache.created_at < _cutoff()))
+
+    total = db.execute(select(func.count()).select_from(AIReviewCache)).scalar_one()
+    excess = total - settings.AI_CACHE_MAX_ROWS
+    if excess > 0:
+        oldest = select(AIReviewCache.key).order_by(AIReviewCache.created_at.asc()).limit(excess)
+        db.execute(delete(AIReviewCache).where(AIReviewCache.key.in_(oldest)))
+    db.commit()
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Sequence
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models import Card, Project, UsageCounter, User
+
+# Denormalised counts, so usage stats never have to COUNT(*) a user's cards:
+#   projects.card_count        live cards per project
+#   users.cards_total          live cards per user
+#   usage_counters (user, month): cards created that month that still exist, AI reviews charged
+# The card helpers (cards_store / md_import) and consume_ai call in here in the same transaction
+# as the write they count. `python -m app.reconcile` recomputes them if they ever drift.
+
+
+def month_key(dt: datetime | None = None) -> str:
+    """
+    "YYYY-MM" of dt in UTC (naive datetimes are taken as UTC); default now.
+    """
+    dt = dt or datetime.now(timezone.utc)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return f"{dt.year:04d}-{dt.month:02d}"
+
+
+def _upsert(db: Session, user_id: int, month: str, values: dict, increment: bool) -> None:
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert(UsageCounter).values(user_id=user_id, month=month, **values)
+    if increment:
+        set_ = {k: getattr(UsageCounter, k) + getattr(stmt.excluded, k) for k in values}
+    else:
+        set_ = {k: getattr(stmt.excluded, k) for k in values}
+    db.execute(stmt.on_conflict_do_update(index_elements=["user_id", "month"], set_=set_))
+
+
+def _add_to_project(db: Session, project_id: int, n: int) -> int | None:
+    # card_count = card_count + n in SQL, like bump_revision; hands back the owner to charge
+    owner_id = db.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(card_count=Project.card_count + n)
+        .returning(Project.owner_id)
+    ).scalar_one()
+    if owner_id is not None:
+        db.execute(update(User).where(User.id == owner_id).values(cards_total=User.cards_total + n))
+    return owner_id
+
+
+def cards_added(db: Session, project_id: int, n: int) -> None:
+    """
+    Count n new cards in a project (created now). Does NOT commit.
+    """
+    if n <= 0:
+        return
+    owner_id = _add_to_project(db, project_id, n)
+    if owner_id is not None:
+        _upsert(db, owner_id, month_key(), {"cards_created": n}, increment=True)
+
+
+def cards_removed(db: Session, project_id: int, created: Sequence[datetime | None]) -> None:
+    """
+    Uncount deleted cards of a project, given their created_at. Does NOT commit.
+    """
+    if not created:
+        return
+    owner_id = _add_to_project(db, project_id, -len(created))
+    if owner_id is None:
+        return
+    for month, n in Counter(month_key(dt) for dt in created if dt is not None).items():
+        _upsert(db, owner_id, month, {"cards_created": -n}, increment=True)
+
+
+def ai_reviews_added(db: Session, user_id: int, n: int = 1) -> None:
+    """
+    Count n charged AI reviews this month. Does NOT commit.
+    """
+    if n > 0:
+        _upsert(db, user_id, month_key(), {"ai_reviews": n}, increment=True)
+
+
+def _month_of(db: Session, col):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(func.timezone("UTC", col), "YYYY-MM")
+    return func.strftime("%Y-%m", col)
+
+
+def reconcile(db: Session, user_id: int | None = None) -> dict[str, int]:
+    """
+    Recompute the counters from the cards (all users, or just user_id) and fix the ones that
+    are off. This month's ai_reviews come from users.usage_count (the quota meter); earlier
+    months have nothing to recompute them from and are left alone.
+    Commits. Returns how many rows were fixed per counter.
+    """
+    projects = select(Project.id, Project.owner_id, Project.card_count)
+    users = select(User.id, User.cards_total, User.usage_month, User.usage_count)
+    per_project = select(Card.project_id, func.count()).group_by(Card.project_id)
+    month = _month_of(db, Card.created_at)
+    per_month = (
+        select(Project.owner_id, month, func.count())
+        .join(Project, Project.id == Card.project_id)
+        .where(Card.created_at.is_not(None), Project.owner_id.is_not(None))
+        .group_by(Project.owner_id, month)
+    )
+    stored = select(UsageCounter.user_id, UsageCounter.month, UsageCounter.cards_created, UsageCounter.ai_reviews)
+    if user_id is not None:
+        projects = projects.where(Project.owner_id == user_id)
+        users = users.where(User.id == user_id)
+        per_project = per_project.join(Project, Project.id == Card.project_id).where(Project.owner_id == user_id)
+        per_month = per_month.where(Project.owner_id == user_id)
+        stored = stored.where(UsageCounter.user_id == user_id)
+
+    fixed = {"projects": 0, "users": 0, "months": 0}
+
+    card_counts = dict(db.execute(per_project).all())
+    user_totals: Counter[int] = Counter()
+    for pid, owner_id, card_count in db.execute(projects).all():
+        actual = card_counts.get(pid, 0)
+        if owner_id is not None:
+            user_totals[owner_id] += actual
+        if card_count != actual:
+            db.execute(update(Project).where(Project.id == pid).values(card_count=actual))
+            fixed["projects"] += 1
+
+    ai_now: dict[tuple[int, str], int] = {}
+    for uid, cards_total, usage_month, usage_count in db.execute(users).all():
+        if cards_total != user_totals[uid]:
+            db.execute(update(User).where(User.id == uid).values(cards_total=user_totals[uid]))
+            fixed["users"] += 1
+        if usage_month:
+            ai_now[(uid, usage_month)] = usage_count or 0
+
+    months: dict[tuple[int, str], dict] = {}
+    for uid, mk, n in db.execute(per_month).all():
+        months[(uid, mk)] = {"cards_created": n}
+    for key, n in ai_now.items():
+        months.setdefault(key, {})["ai_reviews"] = n
+
+    for uid, mk, cards_created, ai_reviews in db.execute(stored).all():
+        want = months.pop((uid, mk), {})
+        want.setdefault("cards_created", 0)
+        if want["cards_created"] != cards_created or want.get("ai_reviews", ai_reviews) != ai_reviews:
+            _upsert(db, uid, mk, want, increment=False)
+            fixed["months"] += 1
+    # months with cards / reviews but no row yet
+    for (uid, mk), want in months.items():
+        _upsert(db, uid, mk, want, increment=False)
+        fixed["months"] += 1
+
+    db.commit()
+    return fixed
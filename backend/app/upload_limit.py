@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import re
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Multipart boundaries and part headers around the file itself
+MULTIPART_SLACK = 64 * 1024
+
+
+class UploadLimitMiddleware:
+    """
+    Refuse an upload body larger than max_bytes (plus multipart framing) on the matching paths
+    while it arrives, rather than after the framework has spooled all of it: up front from
+    Content-Length, and by counting the chunks for uploads sent without one (413 either way).
+    The routes still check the file's own size once it is parsed.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, paths: str):
+        self.app = app
+        self.max_bytes = max_bytes + MULTIPART_SLACK
+        self.paths = re.compile(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.paths.fullmatch(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await JSONResponse({"detail": "File too large"}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # raised from inside body parsing, so it reaches the exception handlers as is
+                    raise HTTPException(status_code=413, detail="File too large")
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+# Standalone AI job worker:
+#
+#     python -m app.worker
+#
+# Runs the same loop the API starts in-process when AI_WORKER_IN_PROCESS=true.
+# Several workers (in-process or not) can run against the same database.
+# Run `python -m app.migrate` first; the worker doesn't create tables.
+
+import asyncio
+import logging
+import signal
+
+from .services.ai_jobs import run_worker
+from .services.openai_client import close_client
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: fall back to KeyboardInterrupt
+            pass
+
+    try:
+        await run_worker(stop)
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+# Throughput/latency benchmark for the AI review path, against the local fake OpenAI.
+#
+#     cd backend
+#     python -m bench.bench_review --cards 200 --concurrency 1,8,32 --target card,route,batch
+#
+# By default a fake server (bench/fake_openai.py) is spawned on a free port; pass
+# --base-url to use one that's already running. route/batch targets run the real app
+# under uvicorn on a throwaway SQLite database.
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn_fake(args) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    cmd = [
+        sys.executable, "-m", "bench.fake_openai",
+        "--port", str(port),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+        "--throttle-rate", str(args.throttle_rate),
+    ]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR)
+    base = f"http://127.0.0.1:{port}"
+    _wait_healthy(base, proc, "fake OpenAI server")
+    return proc, f"{base}/v1"
+
+
+def _wait_healthy(base: str, proc: subprocess.Popen, what: str) -> None:
+    import httpx
+
+    for _ in range(150):
+        try:
+            if httpx.get(f"{base}/health", timeout=0.5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{what} did not start")
+
+
+def _pct(sorted_vals: list[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(p / 100 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[k]
+
+
+def _report(target: str, conc: int, n: int, latencies: list[float], errors: int, wall: float) -> None:
+    lat = sorted(latencies)
+    print(
+        f"{target:<6} {conc:>5} {n:>6} "
+        f"{_pct(lat, 50) * 1000:>9.1f} {_pct(lat, 95) * 1000:>9.1f} {_pct(lat, 99) * 1000:>9.1f} "
+        f"{(n - errors) / wall if wall else 0:>9.1f} {errors:>6}"
+    )
+
+
+def _cards(n: int) -> list[tuple[str, str]]:
+    # unique text per run so the review cache never short-circuits the measurement
+    run = uuid.uuid4().hex[:8]
+    return [(f"[{run}] What is the colour of sample {i}?", f"- answer {i}\n- detail {i}") for i in range(n)]
+
+
+async def bench_card(n: int, conc: int, args) -> None:
+    from app.services.ai_review import review_card
+
+    sem = asyncio.Semaphore(conc)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(front: str, back: str) -> None:
+        nonlocal errors
+        async with sem:
+            t = time.perf_counter()
+            try:
+                await review_card(front, back, "en-AU", args.mode, args.fused)
+            except Exception as e:
+                if not errors:
+                    print(f"  first error: {e!r}")
+                errors += 1
+            latencies.append(time.perf_counter() - t)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(f, b) for f, b in _cards(n)))
+    _report("card", conc, n, latencies, errors, time.perf_counter() - t0)
+
+
+def _seed(n: int) -> tuple[int, int, list[int], str]:
+    """
+    One user on the top plan + one project with n fresh cards. Returns (uid, pid, card_ids, cookie).
+    """
+    from app.auth import create_access_token, hash_password
+    from app.db import SessionLocal
+    from app.models import Card, Project, User
+
+    db = SessionLocal()
+    try:
+        user = User(username="bench", email=f"bench-{uuid.uuid4().hex[:8]}@example.com",
+                    password_hash=hash_password("bench"), plan="platinum", usage_count=0)
+        db.add(user)
+        db.flush()
+        proj = Project(owner_id=user.id, name="bench")
+        db.add(proj)
+        db.flush()
+        cards = [Card(project_id=proj.id, card_type="qa", front=f, back=b) for f, b in _cards(n)]
+        db.add_all(cards)
+        db.commit()
+        return user.id, proj.id, [c.id for c in cards], create_access_token(user.id)
+    finally:
+        db.close()
+
+
+_api_base = ""
+
+
+def _spawn_api() -> subprocess.Popen:
+    """
+    Run the real app under uvicorn (same env, same SQLite file) so route/batch numbers
+    include HTTP, the event loop and the DB pool as in production.
+    """
+    global _api_base
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+    )
+    _api_base = f"http://127.0.0.1:{port}"
+    _wait_healthy(_api_base, proc, "API")
+    return proc
+
+
+def _api_client(cookie: str):
+    import httpx
+    from app.config import settings
+
+    return httpx.AsyncClient(
+        base_url=_api_base,
+        cookies={settings.COOKIE_NAME: cookie},
+        timeout=None,
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+    )
+
+
+async def bench_route(n: int, conc: int, args) -> None:
+    _, pid, card_ids, cookie = _seed(n)
+    sem = asyncio.Semaphore(conc)
+    latencies: list[float] = []
+    errors = 0
+
+    async with _api_client(cookie) as client:
+        async def one(cid: int) -> None:
+            nonlocal errors
+            async with sem:
+                t = time.perf_counter()
+                try:
+                    r = await client.post("/ai/review", json={
+                        "project_id": pid, "card_id": cid, "mode": args.mode, "fused": args.fused,
+                    })
+                    ok = r.status_code == 200
+                except Exception:
+                    ok = False
+                if not ok:
+                    errors += 1
+                latencies.append(time.perf_counter() - t)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(cid) for cid in card_ids))
+        _report("route", conc, n, latencies, errors, time.perf_counter() - t0)
+
+
+async def bench_batch(n: int, conc: int, args) -> None:
+    import json
+
+    _, pid, _, cookie = _seed(n)
+    latencies: list[float] = []
+    errors = 0
+
+    async with _api_client(cookie) as client:
+        t0 = time.perf_counter()
+        async with client.stream("POST", "/ai/review-batch", json={
+            "project_id": pid, "mode": args.mode, "fused": args.fused,
+            "concurrency": conc, "packed": args.packed,
+        }) as r:
+            async for raw in r.aiter_lines():
+                if not raw:
+                    continue
+                ev = json.loads(raw)
+                if ev.get("type") != "result":
+                    continue
+                # per-card latency = time from request start until that card's result arrived
+                latencies.append(time.perf_counter() - t0)
+                if not ev.get("ok"):
+                    errors += 1
+        _report("batch", conc, n, latencies, errors, time.perf_counter() - t0)
+
+
+TARGETS = {"card": bench_card, "route": bench_route, "batch": bench_batch}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark the AI review path against a fake OpenAI")
+    ap.add_argument("--cards", default="100", help="comma-separated card counts")
+    ap.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    ap.add_argument("--target", default="card,route,batch", help="card (review_card), route (/ai/review), batch (/ai/review-batch)")
+    ap.add_argument("--mode", default="content", choices=["content", "format", "both"])
+    ap.add_argument("--fused", action="store_true", help="single-call pipeline for mode=both")
+    ap.add_argument("--packed", action="store_true", help="pack cards per request (batch target)")
+    ap.add_argument("--base-url", default="", help="use an already running fake/real endpoint")
+    ap.add_argument("--latency-ms", type=float, default=300)
+    ap.add_argument("--jitter-ms", type=float, default=100)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--throttle-rate", type=float, default=0.0)
+    ap.add_argument("--rpm", type=int, default=1_000_000, help="client-side limiter RPM (default: effectively off)")
+    ap.add_argument("--tpm", type=int, default=1_000_000_000, help="client-side limiter TPM")
+    args = ap.parse_args()
+
+    proc = None
+    base_url = args.base_url
+    if not base_url:
+        proc, base_url = _spawn_fake(args)
+
+    db_path = Path(tempfile.mkdtemp(prefix="n2a_bench_")) / "bench.db"
+
+    # Must be set before the app modules read settings
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "sk-bench"
+    os.environ["OPENAI_RPM"] = str(args.rpm)
+    os.environ["OPENAI_TPM"] = str(args.tpm)
+    os.environ["OPENAI_MAX_CONCURRENCY"] = os.environ.get("OPENAI_MAX_CONCURRENCY", "256")
+    os.environ["AI_WORKER_IN_PROCESS"] = "false"
+    # let the batch endpoint go as wide as the widest level we measure
+    os.environ["AI_BATCH_CONCURRENCY"] = str(max(int(x) for x in args.concurrency.split(",")))
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from app.migrate import upgrade
+    from app.services.openai_client import close_client
+
+    upgrade(configure_logger=False)
+
+    targets = [t.strip() for t in args.target.split(",") if t.strip()]
+    api = _spawn_api() if set(targets) & {"route", "batch"} else None
+
+    async def run_all() -> None:
+        # one event loop for everything: the pooled OpenAI client lives on it
+        try:
+            for target in targets:
+                for n in [int(x) for x in args.cards.split(",")]:
+                    for conc in [int(x) for x in args.concurrency.split(",")]:
+                        await TARGETS[target](n, conc, args)
+        finally:
+            await close_client()
+
+    try:
+        print(f"base_url={base_url} mode={args.mode} fused={args.fused} packed={args.packed}")
+        print(f"{'target':<6} {'conc':>5} {'cards':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cards/s':>9} {'errors':>6}")
+        asyncio.run(run_all())
+    finally:
+        for p in (api, proc):
+            if p:
+                p.terminate()
+                p.wait(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+# Query plans for the hot read endpoints, to check they stay on indexes.
+#
+#     cd backend
+#     python -m bench.explain_queries                       # throwaway SQLite database
+#     python -m bench.explain_queries --database-url postgresql://...   # a scratch Postgres
+#
+# The database is migrated and seeded (one user, --projects projects, --cards cards in one
+# of them), then each endpoint is called through the real app and every SELECT it runs is
+# EXPLAINed with the same parameters. Plans that scan a whole table or sort in a temp
+# structure are marked "!!"; --strict exits non-zero if there are any. Don't point it at
+# a database you care about: it writes its seed data there.
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# SQLite: "SCAN cards" (no index); Postgres: "Seq Scan on cards". Covering-index scans are fine.
+_BAD_PLAN = re.compile(r"^SCAN \w+( AS \w+)?$|USE TEMP B-TREE|Seq Scan on|\bSort  \(", re.M)
+
+
+def _seed(projects: int, cards: int) -> tuple[int, int, str]:
+    """
+    One user with `projects` projects; the last one gets `cards` cards and some history
+    (edits and deletes, so delta sync has something to find). Returns (pid, last card id, cookie).
+    Other users (with usage counters) fill the per-user tables, or the planner scans them.
+    """
+    from sqlalchemy import insert
+
+    from app.auth import create_access_token, hash_password
+    from app.db import SessionLocal
+    from app.models import Project, UsageCounter, User
+    from app.services.usage_counters import month_key
+    from app.services.cards_store import bump_revision, card_row, delete_cards, insert_returning
+
+    db = SessionLocal()
+    try:
+        user = User(username="explain", email=f"explain-{uuid.uuid4().hex[:8]}@example.com",
+                    password_hash=hash_password("explain"), plan="platinum", usage_count=0,
+                    stripe_customer_id=f"cus_{uuid.uuid4().hex[:14]}")
+        db.add(user)
+        db.flush()
+        others = db.execute(
+            insert(User).returning(User.id),
+            [{"username": f"other{i}", "email": f"other-{uuid.uuid4().hex[:8]}@example.com",
+              "password_hash": user.password_hash, "plan": "free", "usage_count": 0} for i in range(200)],
+        ).scalars().all()
+        db.execute(insert(UsageCounter), [{"user_id": uid, "month": month_key()} for uid in others])
+        for i in range(projects):
+            proj = Project(owner_id=user.id, name=f"explain {i}")
+            db.add(proj)
+            db.flush()
+        rev = bump_revision(db, proj.id)
+        rows = insert_returning(db, [card_row(proj.id, ("qa", f"q{i}", f"a{i}", None), rev) for i in range(cards)])
+        delete_cards(db, proj.id, bump_revision(db, proj.id), [r.id for r in rows[::50]])
+        db.commit()
+        return proj.id, rows[-1].id, create_access_token(user.id)
+    finally:
+        db.close()
+
+
+def _explain(conn, statement: str, params) -> str:
+    dialect = conn.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    rows = conn.exec_driver_sql(prefix + statement, params).all()
+    if dialect == "sqlite":
+        # (id, parent, notused, detail)
+        return "\n".join(r[-1] for r in rows)
+    return "\n".join(r[0] for r in rows)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="EXPLAIN the queries behind the hot read endpoints")
+    ap.add_argument("--database-url", default="", help="scratch database (default: a temp SQLite file)")
+    ap.add_argument("--projects", type=int, default=50)
+    ap.add_argument("--cards", type=int, default=5000)
+    ap.add_argument("--strict", action="store_true", help="exit 1 if any plan is marked")
+    args = ap.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        db_path = Path(tempfile.mkdtemp(prefix="n2a_explain_")) / "explain.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["AI_WORKER_IN_PROCESS"] = "false"
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, select
+
+    from app.config import settings
+    from app.db import engine
+    from app.migrate import upgrade
+    from app.models import User
+
+    upgrade(configure_logger=False)
+    pid, last_id, cookie = _seed(args.projects, args.cards)
+
+    # ANALYZE so the planner sees realistic table sizes
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    endpoints = [
+        ("GET", "/projects"),
+        ("GET", "/projects/latest"),
+        ("GET", f"/cards/{pid}?limit=100"),
+        ("GET", f"/cards/{pid}?limit=100&after={last_id // 2}&fields=front,back"),
+        ("GET", f"/projects/{pid}/cards?limit=100"),
+        ("GET", f"/projects/{pid}/changes?since=1&limit=100"),
+        ("GET", "/cards/search?q=q12&limit=20"),
+        ("GET", "/usage/me"),
+    ]
+
+    captured: list[tuple[str, object]] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    from app.main import app
+
+    client = TestClient(app, cookies={settings.COOKIE_NAME: cookie})
+    plans: list[tuple[str, str, str]] = []
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        for method, url in endpoints:
+            captured.clear()
+            r = client.request(method, url)
+            if r.status_code != 200:
+                raise RuntimeError(f"{method} {url} -> {r.status_code}: {r.text[:200]}")
+            for statement, params in captured:
+                plans.append((f"{method} {url}", statement, params))
+
+        # Stripe webhook: customer lookup (the route needs a signed event, so run the query directly)
+        captured.clear()
+        with engine.connect() as conn:
+            conn.execute(select(User.id).where(User.stripe_customer_id == "cus_explain"))
+        plans.extend(("POST /stripe/webhook (customer lookup)", s, p) for s, p in captured)
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+
+    marked = 0
+    seen: set[str] = set()
+    with engine.connect() as conn:
+        for where, statement, params in plans:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            plan = _explain(conn, statement, params)
+            bad = bool(_BAD_PLAN.search(plan))
+            marked += bad
+            print(f"{'!!' if bad else 'ok'} {where}")
+            print("   " + " ".join(statement.split()))
+            print("   " + plan.replace("\n", "\n   "))
+            print()
+
+    print(f"{len(seen)} queries, {marked} marked")
+    if args.strict and marked:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+# Local stand-in for the OpenAI Responses API, for benchmarking the review path offline.
+#
+#     python -m bench.fake_openai --port 8787 --latency-ms 800 --jitter-ms 300 --error-rate 0.01
+#
+# then run the API / bench with OPENAI_BASE_URL=http://127.0.0.1:8787/v1
+#
+# It understands the request shapes ai_review.py sends (single, packed, fused), streamed
+# or not, and echoes the card back unchanged, optionally overlaid with canned fields.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("FAKE_LATENCY_MS", "500"))
+JITTER_MS = float(os.getenv("FAKE_JITTER_MS", "200"))
+ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0"))
+THROTTLE_RATE = float(os.getenv("FAKE_THROTTLE_RATE", "0"))
+OUTPUT_FILE = os.getenv("FAKE_OUTPUT_FILE", "")
+
+
+def _load_canned() -> list[dict]:
+    """
+    FAKE_OUTPUT_FILE: a JSON object, or a list of objects picked at random,
+    overlaid on the echoed card, e.g. [{"flag": "ok"}, {"flag": "incorrect", "feedback": "wrong"}]
+    """
+    if not OUTPUT_FILE:
+        return [{}]
+    with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+CANNED = _load_canned()
+
+_single_re = re.compile(r"Front:\n(.*)\n\nBack:\n(.*?)\n?\Z", re.S)
+
+app = FastAPI(title="fake-openai")
+
+stats = {"requests": 0, "errors": 0, "throttled": 0}
+
+
+def _card(front: str, back: str, **extra) -> dict:
+    out = {"changed": False, "flag": "ok", "feedback": "", "front": front, "back": back}
+    out.update(random.choice(CANNED))
+    out.update(extra)
+    return out
+
+
+def _answer(system: str, user: str) -> dict:
+    header, _, body = user.partition("\n\n")
+
+    if body.lstrip().startswith("{"):
+        # packed: {"cards": [{"id", "front", "back"}, ...]}
+        cards = json.loads(body).get("cards", [])
+        return {"cards": [_card(c.get("front", ""), c.get("back", ""), id=c.get("id")) for c in cards]}
+
+    m = _single_re.search(body)
+    front, back = (m.group(1), m.group(2)) if m else ("", "")
+
+    if "TWO STAGES" in system:
+        c = _card(front, back)
+        return {"content": c, "format": {**c, "flag": "format_ok"}}
+
+    return _card(front, back)
+
+
+def _response(obj: dict, prompt_chars: int) -> dict:
+    text = json.dumps(obj)
+    in_tok = prompt_chars // 4
+    out_tok = len(text) // 4
+    return {
+        "id": f"resp_fake_{random.getrandbits(48):x}",
+        "object": "response",
+        "output": [{"type": "message", "role": "assistant", "content": [{"type": "output_text", "text": text}]}],
+        "usage": {"input_tokens": in_tok, "output_tokens": out_tok, "total_tokens": in_tok + out_tok},
+    }
+
+
+def _sse(obj: dict) -> str:
+    return f"event: {obj['type']}\ndata: {json.dumps(obj)}\n\n"
+
+
+async def _stream(resp: dict, delay: float):
+    """
+    Streamed Responses API events. The first delta arrives after ~25% of the latency,
+    the rest is spread over the remainder in ~16-char chunks.
+    """
+    text = resp["output"][0]["content"][0]["text"]
+    chunks = [text[i:i + 16] for i in range(0, len(text), 16)] or [""]
+    yield _sse({"type": "response.created", "response": {"id": resp["id"], "status": "in_progress"}})
+    await asyncio.sleep(delay * 0.25)
+    step = delay * 0.75 / len(chunks)
+    for i, chunk in enumerate(chunks):
+        if i:
+            await asyncio.sleep(step)
+        yield _sse({"type": "response.output_text.delta", "item_id": "msg_fake", "output_index": 0, "content_index": 0, "delta": chunk})
+    yield _sse({"type": "response.completed", "response": {**resp, "status": "completed"}})
+
+
+@app.get("/health")
+def health():
+    return {"ok": True, **stats}
+
+
+@app.post("/v1/responses")
+async def responses(request: Request):
+    stats["requests"] += 1
+    payload = await request.json()
+
+    delay = max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000.0
+    stream = bool(payload.get("stream"))
+    if not stream:
+        await asyncio.sleep(delay)
+
+    r = random.random()
+    if r < THROTTLE_RATE:
+        stats["throttled"] += 1
+        return JSONResponse({"error": {"message": "Rate limit reached (fake)"}}, status_code=429, headers={"retry-after-ms": "200"})
+    if r < THROTTLE_RATE + ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse({"error": {"message": "Internal error (fake)"}}, status_code=500)
+
+    msgs = payload.get("input") or []
+    system = next((m.get("content", "") for m in msgs if m.get("role") == "system"), "")
+    user = next((m.get("content", "") for m in msgs if m.get("role") == "user"), "")
+
+    resp = _response(_answer(system, user), len(system) + len(user))
+    if stream:
+        return StreamingResponse(_stream(resp, delay), media_type="text/event-stream")
+    return resp
+
+
+def main() -> None:
+    global LATENCY_MS, JITTER_MS, ERROR_RATE, THROTTLE_RATE, OUTPUT_FILE, CANNED
+
+    ap = argparse.ArgumentParser(description="Fake OpenAI Responses API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    ap.add_argument("--jitter-ms", type=float, default=JITTER_MS)
+    ap.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    ap.add_argument("--throttle-rate", type=float, default=THROTTLE_RATE)
+    ap.add_argument("--output-file", default=OUTPUT_FILE)
+    args = ap.parse_args()
+
+    LATENCY_MS, JITTER_MS = args.latency_ms, args.jitter_ms
+    ERROR_RATE, THROTTLE_RATE = args.error_rate, args.throttle_rate
+    OUTPUT_FILE = args.output_file
+    CANNED = _load_canned()
+
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
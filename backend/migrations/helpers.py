@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+# Databases created before migrations existed were built by Base.metadata.create_all, from
+# whatever the models looked like at the time. The early revisions check what is already
+# there so that `upgrade head` works on those as well as on an empty database.
+
+import sqlalchemy as sa
+from alembic import context, op
+
+
+def _inspector() -> sa.Inspector | None:
+    # offline (--sql) runs have no database to look at: render everything
+    return None if context.is_offline_mode() else sa.inspect(op.get_bind())
+
+
+def has_table(table: str) -> bool:
+    insp = _inspector()
+    return insp is not None and insp.has_table(table)
+
+
+def has_column(table: str, column: str) -> bool:
+    insp = _inspector()
+    return insp is not None and any(c["name"] == column for c in insp.get_columns(table))
+
+
+def has_index(table: str, index: str) -> bool:
+    insp = _inspector()
+    return insp is not None and any(i["name"] == index for i in insp.get_indexes(table))
+
+
+def is_sqlite() -> bool:
+    return op.get_bind().dialect.name == "sqlite"
+
+
+def create_index(
+    index: str, table: str, columns: list[str], unique: bool = False, concurrently: bool = False
+) -> None:
+    """
+    Create an index if it's missing. concurrently=True builds it CONCURRENTLY on Postgres
+    (outside the migration transaction), so a big live table stays writable meanwhile.
+    """
+    if has_index(table, index):
+        return
+    if concurrently and op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(index, table, columns, unique=unique, postgresql_concurrently=True)
+    else:
+        op.create_index(index, table, columns, unique=unique)
+
+
+def drop_index(index: str, table: str) -> None:
+    if context.is_offline_mode() or has_index(table, index):
+        op.drop_index(index, table_name=table)
@@ -0,0 +1,84 @@
+"""Initial schema: users, password resets, projects, cards
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index, has_table
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # tables already made by create_all are left as they are
+    if not has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(64), nullable=False),
+            sa.Column("email", sa.String(255), nullable=False),
+            sa.Column("password_hash", sa.String(255), nullable=False),
+            sa.Column("stripe_customer_id", sa.String(255), nullable=True),
+            sa.Column("plan", sa.String(32), nullable=False),
+            sa.Column("usage_month", sa.String(16), nullable=True),
+            sa.Column("usage_count", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    create_index("ix_users_id", "users", ["id"])
+    create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if not has_table("password_resets"):
+        op.create_table(
+            "password_resets",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("token_hash", sa.String(255), nullable=False),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("used", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    create_index("ix_password_resets_user_id", "password_resets", ["user_id"])
+    create_index("ix_password_resets_token_hash", "password_resets", ["token_hash"])
+
+    if not has_table("projects"):
+        op.create_table(
+            "projects",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    create_index("ix_projects_owner_id", "projects", ["owner_id"])
+
+    if not has_table("cards"):
+        op.create_table(
+            "cards",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id"), nullable=False),
+            sa.Column("card_type", sa.String(16), nullable=False),
+            sa.Column("front", sa.Text(), nullable=False),
+            sa.Column("back", sa.Text(), nullable=False),
+            sa.Column("raw", sa.Text(), nullable=True),
+            sa.Column("ai_changed", sa.Boolean(), nullable=False),
+            sa.Column("ai_flag", sa.String(32), nullable=True),
+            sa.Column("ai_feedback", sa.Text(), nullable=True),
+            sa.Column("ai_suggest_front", sa.Text(), nullable=True),
+            sa.Column("ai_suggest_back", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    create_index("ix_cards_project_id", "cards", ["project_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("cards")
+    op.drop_table("projects")
+    op.drop_table("password_resets")
+    op.drop_table("users")
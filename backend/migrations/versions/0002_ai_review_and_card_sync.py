@@ -0,0 +1,108 @@
+"""AI review cache and jobs; card fingerprints, revisions and tombstones
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index, drop_index, has_column, has_table, is_sqlite
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+_CARD_COLUMNS = [
+    ("ai_review_hash", lambda: sa.Column("ai_review_hash", sa.String(64), nullable=True)),
+    ("source_fingerprint", lambda: sa.Column("source_fingerprint", sa.String(64), nullable=True)),
+    ("revision", lambda: sa.Column("revision", sa.Integer(), nullable=False, server_default="0")),
+    ("updated_at", lambda: sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now())),
+]
+
+
+def upgrade() -> None:
+    if not has_table("ai_review_cache"):
+        op.create_table(
+            "ai_review_cache",
+            sa.Column("key", sa.String(64), primary_key=True),
+            sa.Column("result", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    create_index("ix_ai_review_cache_created_at", "ai_review_cache", ["created_at"])
+
+    if not has_table("ai_jobs"):
+        op.create_table(
+            "ai_jobs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id"), nullable=False),
+            sa.Column("status", sa.String(16), nullable=False),
+            sa.Column("variant", sa.String(16), nullable=False),
+            sa.Column("mode", sa.String(16), nullable=False),
+            sa.Column("apply", sa.Boolean(), nullable=False),
+            sa.Column("fused", sa.Boolean(), nullable=False),
+            sa.Column("total", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    create_index("ix_ai_jobs_owner_id", "ai_jobs", ["owner_id"])
+    create_index("ix_ai_jobs_project_id", "ai_jobs", ["project_id"])
+
+    if not has_table("ai_job_items"):
+        op.create_table(
+            "ai_job_items",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("job_id", sa.Integer(), sa.ForeignKey("ai_jobs.id"), nullable=False),
+            sa.Column("card_id", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(16), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("available_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("flag", sa.String(32), nullable=True),
+            sa.Column("cached", sa.Boolean(), nullable=False),
+            sa.Column("error", sa.Text(), nullable=True),
+        )
+    create_index("ix_ai_job_items_job_id", "ai_job_items", ["job_id"])
+    create_index("ix_ai_job_items_status", "ai_job_items", ["status"])
+
+    for name in ("revision", "reset_revision"):
+        if not has_column("projects", name):
+            op.add_column("projects", sa.Column(name, sa.Integer(), nullable=False, server_default="0"))
+
+    missing = [make() for name, make in _CARD_COLUMNS if not has_column("cards", name)]
+    if missing:
+        # SQLite can't ADD COLUMN with a non-constant default (updated_at): rebuild the table there
+        with op.batch_alter_table("cards", recreate="always" if is_sqlite() else "auto") as batch:
+            for column in missing:
+                batch.add_column(column)
+    create_index("ix_cards_project_id_revision", "cards", ["project_id", "revision"])
+
+    if not has_table("card_tombstones"):
+        op.create_table(
+            "card_tombstones",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id"), nullable=False),
+            sa.Column("card_id", sa.Integer(), nullable=False),
+            sa.Column("revision", sa.Integer(), nullable=False),
+            sa.Column("deleted_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    create_index("ix_card_tombstones_project_id_revision", "card_tombstones", ["project_id", "revision"])
+
+
+def downgrade() -> None:
+    op.drop_table("card_tombstones")
+    drop_index("ix_cards_project_id_revision", "cards")
+    with op.batch_alter_table("cards") as batch:
+        for name, _ in reversed(_CARD_COLUMNS):
+            batch.drop_column(name)
+    with op.batch_alter_table("projects") as batch:
+        batch.drop_column("reset_revision")
+        batch.drop_column("revision")
+    op.drop_table("ai_job_items")
+    op.drop_table("ai_jobs")
+    op.drop_table("ai_review_cache")
@@ -0,0 +1,35 @@
+"""Composite indexes for the hot list queries; index users.stripe_customer_id
+
+cards (project_id, id): card listings and keyset paging (filter by project, order by id).
+projects (owner_id, created_at): project lists / latest project (filter by owner, newest first).
+users.stripe_customer_id: Stripe webhook customer lookup.
+The single-column project_id / owner_id indexes are prefixes of the new ones, so they go.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from migrations.helpers import create_index, drop_index
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    create_index("ix_cards_project_id_id", "cards", ["project_id", "id"], concurrently=True)
+    create_index("ix_projects_owner_id_created_at", "projects", ["owner_id", "created_at"], concurrently=True)
+    create_index("ix_users_stripe_customer_id", "users", ["stripe_customer_id"], concurrently=True)
+    drop_index("ix_cards_project_id", "cards")
+    drop_index("ix_projects_owner_id", "projects")
+
+
+def downgrade() -> None:
+    create_index("ix_projects_owner_id", "projects", ["owner_id"])
+    create_index("ix_cards_project_id", "cards", ["project_id"])
+    drop_index("ix_users_stripe_customer_id", "users")
+    drop_index("ix_projects_owner_id_created_at", "projects")
+    drop_index("ix_cards_project_id_id", "cards")
@@ -0,0 +1,82 @@
+"""Full-text index on card front/back for GET /cards/search
+
+Postgres: a GIN index on a weighted tsvector expression (front 'A', back 'B'). Being an
+expression index it is maintained by Postgres itself on every insert/update; queries must
+use the same expression to hit it (services/card_search.SEARCH_VECTOR).
+SQLite: an external-content FTS5 table over cards, kept in sync by triggers and ranked by
+bm25 with front weighted over back.
+
+NB (SQLite): a batch ("move and copy") migration of `cards` drops these triggers along with
+the old table; recreate them afterwards with create_sqlite_fts() from this revision.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+
+from migrations.helpers import has_table, is_sqlite
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Frozen copy of services/card_search.SEARCH_VECTOR: change both or neither.
+PG_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(front, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(back, '')), 'B')"
+)
+
+SQLITE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS cards_fts_ai AFTER INSERT ON cards BEGIN
+        INSERT INTO cards_fts(rowid, front, back) VALUES (new.id, new.front, new.back);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cards_fts_ad AFTER DELETE ON cards BEGIN
+        INSERT INTO cards_fts(cards_fts, rowid, front, back) VALUES ('delete', old.id, old.front, old.back);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cards_fts_au AFTER UPDATE OF front, back ON cards BEGIN
+        INSERT INTO cards_fts(cards_fts, rowid, front, back) VALUES ('delete', old.id, old.front, old.back);
+        INSERT INTO cards_fts(rowid, front, back) VALUES (new.id, new.front, new.back);
+    END
+    """,
+)
+
+
+def create_sqlite_fts() -> None:
+    if not has_table("cards_fts"):
+        op.execute(
+            "CREATE VIRTUAL TABLE cards_fts USING fts5("
+            "front, back, content='cards', content_rowid='id', "
+            "tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        # persistent: ORDER BY rank is then bm25 with front counting double
+        op.execute("INSERT INTO cards_fts(cards_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0)')")
+    for trigger in SQLITE_TRIGGERS:
+        op.execute(trigger)
+    # index whatever is already there (also repairs an index that drifted)
+    op.execute("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')")
+
+
+def upgrade() -> None:
+    if is_sqlite():
+        create_sqlite_fts()
+    else:
+        with op.get_context().autocommit_block():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cards_search ON cards USING gin (({PG_VECTOR}))")
+
+
+def downgrade() -> None:
+    if is_sqlite():
+        for name in ("cards_fts_au", "cards_fts_ad", "cards_fts_ai"):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS cards_fts")
+    else:
+        op.execute("DROP INDEX IF EXISTS ix_cards_search")
@@ -0,0 +1,74 @@
+"""Denormalised usage counters: projects.card_count, users.cards_total, usage_counters
+
+Backfilled from the existing cards (and this month's users.usage_count); from then on the
+card / AI write paths keep them up to date (services/usage_counters.py).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import has_column, has_table, is_sqlite
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not has_column("projects", "card_count"):
+        op.add_column("projects", sa.Column("card_count", sa.Integer(), nullable=False, server_default="0"))
+    if not has_column("users", "cards_total"):
+        op.add_column("users", sa.Column("cards_total", sa.Integer(), nullable=False, server_default="0"))
+    if not has_table("usage_counters"):
+        op.create_table(
+            "usage_counters",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("month", sa.String(7), primary_key=True),
+            sa.Column("cards_created", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("ai_reviews", sa.Integer(), nullable=False, server_default="0"),
+        )
+
+    op.execute("UPDATE projects SET card_count = (SELECT count(*) FROM cards WHERE cards.project_id = projects.id)")
+    op.execute(
+        "UPDATE users SET cards_total = "
+        "(SELECT coalesce(sum(card_count), 0) FROM projects WHERE projects.owner_id = users.id)"
+    )
+
+    month = (
+        "strftime('%Y-%m', cards.created_at)" if is_sqlite()
+        else "to_char(cards.created_at AT TIME ZONE 'UTC', 'YYYY-MM')"
+    )
+    op.execute("DELETE FROM usage_counters")
+    op.execute(
+        "INSERT INTO usage_counters (user_id, month, cards_created, ai_reviews) "
+        f"SELECT projects.owner_id, {month}, count(*), 0 FROM cards "
+        "JOIN projects ON projects.id = cards.project_id "
+        "WHERE projects.owner_id IS NOT NULL AND cards.created_at IS NOT NULL "
+        f"GROUP BY projects.owner_id, {month}"
+    )
+    op.execute(
+        "UPDATE usage_counters SET ai_reviews = (SELECT usage_count FROM users "
+        "WHERE users.id = usage_counters.user_id AND users.usage_month = usage_counters.month) "
+        "WHERE EXISTS (SELECT 1 FROM users "
+        "WHERE users.id = usage_counters.user_id AND users.usage_month = usage_counters.month)"
+    )
+    op.execute(
+        "INSERT INTO usage_counters (user_id, month, cards_created, ai_reviews) "
+        "SELECT id, usage_month, 0, usage_count FROM users "
+        "WHERE usage_month IS NOT NULL AND usage_count > 0 AND NOT EXISTS (SELECT 1 FROM usage_counters "
+        "WHERE usage_counters.user_id = users.id AND usage_counters.month = users.usage_month)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("usage_counters")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("cards_total")
+    with op.batch_alter_table("projects") as batch:
+        batch.drop_column("card_count")
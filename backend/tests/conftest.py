@@ -0,0 +1,7 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# the tests import the app package the way the server does (from backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,164 @@
+# The Markdown parser as it was before the single-pass rewrite (parser_md.py at the commit
+# that added server-side import), kept verbatim as the reference for test_parser_parity.py.
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List
+
+@dataclass
+class ParsedCard:
+    card_type: str
+    front: str
+    back: str
+    raw: str | None = None
+
+def _norm_tag(line: str) -> str | None:
+    s = line.strip().lower()
+    if s.startswith("question:") or s.startswith("quesition:") or s.startswith("quesiton:"):
+        return "question"
+    if s.startswith("mcq:") or s.startswith("mcu:"):
+        return "mcq"
+    return None
+
+def parse_markdown(md_text: str) -> List[ParsedCard]:
+    lines = md_text.splitlines()
+    cards: List[ParsedCard] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        tag = _norm_tag(line)
+        if not tag:
+            i += 1
+            continue
+
+        if tag == "question":
+            q = line.split(":", 1)[1].strip()
+            i += 1
+            ans_lines = []
+            while i < len(lines):
+                nxt = lines[i]
+                if _norm_tag(nxt):
+                    break
+                if nxt.startswith(("    ", "\t", "- ", "* ")):
+                    ans_lines.append(nxt.lstrip(" \t-*•").rstrip())
+                elif nxt.strip() == "":
+                    if ans_lines:
+                        ans_lines.append("")
+                else:
+                    if ans_lines:
+                        break
+                i += 1
+            back = "\n".join(ans_lines).strip()
+            cards.append(ParsedCard(card_type="qa", front=q, back=back))
+            continue
+
+        if tag == "mcq":
+            stem = line.split(":", 1)[1].strip()
+            i += 1
+            options = []
+            answer = ""
+            in_answer = False
+            while i < len(lines):
+                nxt = lines[i]
+                if _norm_tag(nxt):
+                    break
+                if nxt.strip() == "":
+                    i += 1
+                    continue
+                if nxt.strip().lower().startswith("answer:"):
+                    in_answer = True
+                    i += 1
+                    continue
+                if in_answer:
+                    if nxt.startswith(("    ", "\t")):
+                        answer = nxt.strip()
+                        i += 1
+                        continue
+                    break
+                if nxt.startswith(("    ", "\t", "- ", "* ")):
+                    options.append(nxt.lstrip(" \t-*•").rstrip())
+                    i += 1
+                    continue
+                break
+            front = stem + ("\n" + "\n".join(options) if options else "")
+            cards.append(ParsedCard(card_type="mcq", front=front, back=answer.strip()))
+            continue
+
+    return cards
+
+
+def iter_cards(lines: Iterable[str]) -> Iterator[ParsedCard]:
+    """
+    Streaming form of parse_markdown: reads lines one at a time from any iterable
+    (a list, a text file, an upload stream) and yields cards as soon as they end.
+    Trailing newlines are ignored, so file objects can be passed straight in.
+    """
+    it = (ln.rstrip("\r\n") for ln in lines)
+    pushed: list[str] = []
+
+    def take() -> str | None:
+        if pushed:
+            return pushed.pop()
+        return next(it, None)
+
+    while True:
+        line = take()
+        if line is None:
+            return
+        tag = _norm_tag(line)
+        if not tag:
+            continue
+
+        if tag == "question":
+            q = line.split(":", 1)[1].strip()
+            ans_lines = []
+            while True:
+                nxt = take()
+                if nxt is None:
+                    break
+                if _norm_tag(nxt):
+                    pushed.append(nxt)
+                    break
+                if nxt.startswith(("    ", "\t", "- ", "* ")):
+                    ans_lines.append(nxt.lstrip(" \t-*•").rstrip())
+                elif nxt.strip() == "":
+                    if ans_lines:
+                        ans_lines.append("")
+                else:
+                    if ans_lines:
+                        pushed.append(nxt)
+                        break
+            back = "\n".join(ans_lines).strip()
+            yield ParsedCard(card_type="qa", front=q, back=back)
+            continue
+
+        if tag == "mcq":
+            stem = line.split(":", 1)[1].strip()
+            options = []
+            answer = ""
+            in_answer = False
+            while True:
+                nxt = take()
+                if nxt is None:
+                    break
+                if _norm_tag(nxt):
+                    pushed.append(nxt)
+                    break
+                if nxt.strip() == "":
+                    continue
+                if nxt.strip().lower().startswith("answer:"):
+                    in_answer = True
+                    continue
+                if in_answer:
+                    if nxt.startswith(("    ", "\t")):
+                        answer = nxt.strip()
+                        continue
+                    pushed.append(nxt)
+                    break
+                if nxt.startswith(("    ", "\t", "- ", "* ")):
+                    options.append(nxt.lstrip(" \t-*•").rstrip())
+                    continue
+                pushed.append(nxt)
+                break
+            front = stem + ("\n" + "\n".join(options) if options else "")
+            yield ParsedCard(card_type="mcq", front=front, back=answer.strip())
+            continue
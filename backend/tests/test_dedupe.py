@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import dedupe
+from app.services.dedupe import duplicate_of, find_clusters, jaccard, shingles
+
+SHORT = ("Which enzyme unwinds DNA at the replication fork?", "Helicase")
+LONG = (
+    "Which enzyme unwinds the DNA double helix at the replication fork during S phase?",
+    "Helicase, which breaks the hydrogen bonds between base pairs",
+)
+LONG_EDITED = (
+    "Which enzyme unwinds the DNA double helix at the replication fork during S phase",
+    "Helicase, which breaks hydrogen bonds between base pairs.",
+)
+
+
+def card(id: int, text: tuple[str, str]) -> SimpleNamespace:
+    return SimpleNamespace(id=id, front=text[0], back=text[1])
+
+
+def test_formatting_and_case_dont_count():
+    cards = [
+        card(1, ("What is the powerhouse of the cell?", "The mitochondria")),
+        card(2, ("what is the **powerhouse** of the cell", "The mitochondria.")),
+        card(3, ("Define osmosis", "Diffusion of water across a membrane")),
+    ]
+    assert find_clusters(cards, 0.8) == [[(1, 1.0), (2, 1.0)]]
+    assert duplicate_of(cards, 0.8) == {2: 1}
+
+
+def test_cards_without_text_are_never_duplicates():
+    cards = [card(1, ("", "")), card(2, ("", None)), card(3, ("  **  ", ""))]
+    assert find_clusters(cards, 0.5) == []
+
+
+def test_high_threshold_pair_found_with_dissimilar_older_card():
+    cards = [card(1, SHORT), card(2, LONG), card(3, LONG_EDITED)]
+    assert find_clusters(cards, 0.9) == [[(2, 1.0), (3, round(jaccard(shingles(*LONG), shingles(*LONG_EDITED)), 3))]]
+
+
+def test_high_threshold_pair_found_behind_bucket_first_card(monkeypatch):
+    # every card in every bucket: the oldest card comes first everywhere and matches neither
+    # of the others, which still have to be compared with each other
+    sims = shingles(*SHORT), shingles(*LONG), shingles(*LONG_EDITED)
+    assert jaccard(sims[0], sims[1]) < 0.5 and jaccard(sims[0], sims[2]) < 0.5
+    assert jaccard(sims[1], sims[2]) >= 0.9
+    monkeypatch.setattr(dedupe, "signature", lambda sh: (0,) * dedupe.NUM_PERM)
+
+    cards = [card(1, SHORT), card(2, LONG), card(3, LONG_EDITED), card(4, ("Define osmosis", "Diffusion of water"))]
+    clusters = find_clusters(cards, 0.9)
+    assert [[cid for cid, _ in c] for c in clusters] == [[2, 3]]
+
+
+def test_bucket_of_copies_compares_each_card_once(monkeypatch):
+    monkeypatch.setattr(dedupe, "signature", lambda sh: (0,) * dedupe.NUM_PERM)
+    calls = 0
+    real = dedupe.jaccard
+
+    def counting(a, b):
+        nonlocal calls
+        calls += 1
+        return real(a, b)
+
+    monkeypatch.setattr(dedupe, "jaccard", counting)
+    clusters = find_clusters([card(i, LONG) for i in range(1, 201)], 0.9)
+    assert [cid for cid, _ in clusters[0]] == list(range(1, 201))
+    # one candidate check per new card, plus the similarity of each member to the kept card
+    assert calls == 2 * 199
+
+
+@pytest.mark.parametrize("threshold, ids", [(0.8, [1, 2, 3]), (0.95, [1, 3])])
+def test_threshold_decides_membership(threshold, ids):
+    cards = [card(1, LONG), card(2, LONG_EDITED), card(3, LONG)]
+    (cluster,) = find_clusters(cards, threshold)
+    assert cluster[0] == (1, 1.0)
+    assert [cid for cid, _ in cluster] == ids
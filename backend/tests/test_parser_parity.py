@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import io
+import random
+
+import pytest
+
+from app import parser_md
+import legacy_parser_md as legacy
+
+# Notion exports as they come: nested lists, toggles (a bullet with indented children),
+# code fences, headings with no text, CRLF line ends
+CORPUS = {
+    "qa_indented": "Question: What is ATP?\n    Adenosine triphosphate\n    the cell's energy currency\n",
+    "qa_tab_and_bullets": "question: Name two\n\t- first\n- second\n* third\n",
+    "nested_lists": (
+        "Question: Phases of mitosis?\n"
+        "- Prophase\n"
+        "    - chromatin condenses\n"
+        "        - spindle forms\n"
+        "- Metaphase\n"
+        "\t- chromosomes line up\n"
+        "* Anaphase\n"
+        "    * Telophase\n"
+    ),
+    "toggles": (
+        "- Question: Toggle heading\n"
+        "    answer inside the toggle\n"
+        "    \n"
+        "    second paragraph\n"
+        "- MCQ: Toggle MCQ\n"
+        "    - a\n"
+        "    - b\n"
+        "    Answer:\n"
+        "        b\n"
+        "<details><summary>Question: HTML toggle</summary>\n"
+        "    hidden answer\n"
+        "</details>\n"
+    ),
+    "code_fences": (
+        "Question: Print in Python?\n"
+        "    ```python\n"
+        "    print('Question: not a card')\n"
+        "    ```\n"
+        "```\n"
+        "Question: inside an unindented fence\n"
+        "    still parsed as a card\n"
+        "```\n"
+        "MCQ: Which is a fence?\n"
+        "- ```\n"
+        "- ~~~\n"
+        "Answer:\n"
+        "    ```\n"
+    ),
+    "crlf": "Question: CRLF?\r\n    yes\r\n\r\nMCQ: pick\r\n- a\r\n- b\r\nAnswer:\r\n    a\r\n",
+    "mixed_line_ends": "Question: one\r\n    a\nQuestion: two\r    b\r\n",
+    "empty_headings": (
+        "#\n"
+        "## \n"
+        "Question: after empty headings\n"
+        "    answer\n"
+        "###\n"
+        "Question:\n"
+        "    no question text\n"
+        "MCQ:\n"
+        "Answer:\n"
+        "#\n"
+    ),
+    "heading_ends_answer": "# Week 1\nQuestion: q\n    a\n## Next\n    orphan indented line\n",
+    "mcq_full": "MCQ: Capital of Australia?\n- Sydney\n- Canberra\n\n* Melbourne\nAnswer:\n    Canberra\nplain\n",
+    "mcq_answer_unindented": "mcq: stem\n- x\nAnswer:\nnot indented\n    late\n",
+    "typos_and_case": "QUESITION: one\n    a\nquesiton: two\n    b\nMCU: three\n- c\nANSWER:\n    c\n",
+    "unicode_space_and_bullets": " Question: nbsp lead\n    • bullet\n　mcq: ideographic\n- • x\n",
+    "lookalike_tags": "Kmcq: kelvin\nqueſtion: long s\nQUESTİON: dotted\nQuestion no colon\n    x\n",
+    "blank_runs": "Question: q\n\n\n    a\n\n\n    b\n\n\n",
+    "answer_then_text": "Question: q\n    a\nplain text ends it\n    not part of the card\n",
+    "no_cards": "Just notes\n- a list\n    with children\n",
+    "empty": "",
+    "no_trailing_newline": "Question: last\n    line",
+}
+
+
+def legacy_tuples(md: str) -> list[tuple]:
+    return [(c.card_type, c.front, c.back, c.raw) for c in legacy.parse_markdown(md)]
+
+
+def tuples(cards) -> list[tuple]:
+    return [(c.card_type, c.front, c.back, c.raw) for c in cards]
+
+
+@pytest.mark.parametrize("md", CORPUS.values(), ids=CORPUS.keys())
+def test_parse_markdown_matches_legacy(md):
+    assert tuples(parser_md.parse_markdown(md)) == legacy_tuples(md)
+
+
+@pytest.mark.parametrize("md", CORPUS.values(), ids=CORPUS.keys())
+def test_streamed_upload_matches_legacy(md):
+    # what the import route does: a text stream with universal newlines
+    stream = io.TextIOWrapper(io.BytesIO(md.encode()), encoding="utf-8-sig", newline=None)
+    expected = legacy_tuples(md.replace("\r\n", "\n").replace("\r", "\n"))
+    assert tuples(parser_md.iter_cards(stream)) == expected
+    assert parser_md.parse_page(md.encode()) == expected
+
+
+def test_golden_outputs():
+    # pinned, so the two parsers can't drift together
+    assert legacy_tuples(CORPUS["nested_lists"]) == [
+        ("qa", "Phases of mitosis?",
+         "Prophase\nchromatin condenses\nspindle forms\nMetaphase\nchromosomes line up\nAnaphase\nTelophase", None),
+    ]
+    assert tuples(parser_md.parse_markdown(CORPUS["crlf"])) == [
+        ("qa", "CRLF?", "yes", None),
+        ("mcq", "pick\na\nb", "a", None),
+    ]
+    assert tuples(parser_md.parse_markdown(CORPUS["empty_headings"])) == [
+        ("qa", "after empty headings", "answer", None),
+        ("qa", "", "no question text", None),
+        ("mcq", "", "", None),
+    ]
+
+
+FRAGMENTS = [
+    "Question: what is x?", "question: y", "QUESTION:z", "MCQ: pick", "mcu: alt", "Mcq:",
+    "    indented ans", "\tTab ans", "- dash", "* star", "", "plain text", "Answer:", "answer: z",
+    "ANSWER:  q", "    Answer: in", "    B", "Quesition: typo", "quesiton: t", "  two spaces",
+    "• bullet", "    ", "\t", " ", " Question: nbsp", "　mcq: ideo", "queſtion: longs",
+    "QUESTİON: x", "-", "*x", "- ", "question no colon", "  question:  lead", "text: with colon",
+    "mcq:: double", "Kmcq: kelvin", "#", "## ", "```", "    ```", "- Question: toggle", "        deep",
+]
+
+
+def test_random_documents_match_legacy():
+    rng = random.Random(7)
+    for _ in range(3000):
+        md = "\n".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40)))
+        if rng.random() < 0.3:
+            md += "\n"
+        if rng.random() < 0.2:
+            md = md.replace("\n", "\r\n")
+        assert tuples(parser_md.parse_markdown(md)) == legacy_tuples(md), md